@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from qiskit import QuantumCircuit, execute, Aer, IBMQ
-
 import random
 
+import qcards
+import qcircuit
+from qcards import buildDeck
+
 class color:
    BLUE = '\033[44m'
    GREEN = '\033[42m'
@@ -16,33 +18,6 @@ class color:
 class QNO_vars():
     pass
 
-def buildDeck():
-    deck=[]
-    states=["|00>","|01>","|10>","|11>"]
-    values=[0,1,2,3,4,5,6,7,8,9, "Draw Two", "Skip", "Reverse"]
-    gateState=["Gate"]
-    gateVal=["H","X", "CNOT"]
-    # ~ gateVal = ["H"]
-
-    for state in states:
-        for value in values:
-            cardVal=[state,value]
-            deck.append(cardVal)
-            if value != 0:
-                deck.append(cardVal)
-    for i in range(4):
-        for gate in gateState:
-            for gatevalue in gateVal:
-                cardVal=[gate,gatevalue]
-                deck.append(cardVal)
-    # print('======')
-    # print('N cards: ', len(deck))
-    # print('======')
-    # for i in deck:
-    #     print(i)
-    # print('======')
-    return(deck)
-
 def drawCards(qno, numCards):
     cardsDrawn=[]
     for x in range(numCards):
@@ -70,18 +45,9 @@ def showHand(player, playerHand):
         print("")
 
 def canPlay(state, value, playerHand):
+    playable = qcards.playable_mask(state, value)
     for card in playerHand:
-        if card[0]=="Gate":
-            return True
-        if card[0]==state:
-            return True
-        if card[1]==value in card:
-            # print(card[1]==value)
-            # print(card[1]==value in card)
-            # print(card)
-            # print(state)
-            # print(value)
-            # raise
+        if qcards.KIND_MASKS[(card[0], card[1])] & playable:
             return True
     return False
 
@@ -145,7 +111,7 @@ def main():
         currentState=discards[0][0]
         cardVal=discards[0][1]
 
-    qc=QuantumCircuit(2)
+    qc=qcircuit.GameCircuit()
 
     if currentState=="|11>":
         qc.x(0)
@@ -612,6 +578,9 @@ def main():
 
                     measurementGuessOutcome(measurement_guess, random_bit, players)
 
+                # continue the circuit from the measured basis state
+                qc.initialize(currentState[1:3])
+
 
         discards.append([currentState,cardVal])
 
@@ -5,7 +5,6 @@ import pygame_cards.card_sprite
 try:
     import sys
     import os
-    import threading
     import time
     import collections
     import json
@@ -19,9 +18,12 @@ try:
     import opponent
 
     import QNO
+    import qstate
+    import qcircuit
+    import measurement
+    import qno_engine
+    import qcards
     from random import shuffle
-    from qiskit import QuantumCircuit, execute, Aer, IBMQ
-    from qiskit.quantum_info import Statevector
 
 except ImportError as err:
     print("Fail loading a module in file:", __file__, "\n", err)
@@ -36,7 +38,6 @@ CURRENT_STATE = "CURRENT_STATE"
 
 
 OpponentRecord = collections.namedtuple('OpponentRecord', 'hand, info')
-DealState = collections.namedtuple('DealState', 'cards_per_player, round, next_player')
 SuitInfo = collections.namedtuple('SuitInfo', 'name, symbol, description, button_txt, qiskit_index')
 ToggleOption = collections.namedtuple('ToggleOption', 'json_object, id_')
 
@@ -67,6 +68,7 @@ class PlayDirectionImage(card_holder.CardsHolder):
     def setupImage(self, img_path):
         img = pygame.image.load(img_path)
         self.img_scaled = pygame.transform.scale(img, (163, 161))
+        self.img_flipped = pygame.transform.flip(self.img_scaled, False, True)
 
     def toggleDirection(self):
         print('REVERSING!!!')
@@ -81,10 +83,17 @@ class PlayDirectionImage(card_holder.CardsHolder):
         return False
     def render(self, screen):
         # draw_empty_card_pocket(self, screen, 163, 161)
-        img_scaled = self.img_scaled
-        if self.playDirection==1:
-            img_scaled = pygame.transform.flip(self.img_scaled, False, True)
-        screen.blit(img_scaled, (self.pos[0], self.pos[1]))
+        pass # The arrow is drawn by render_all() from get_draw_list().
+
+    def get_draw_list(self):
+        img_scaled = self.img_flipped if self.playDirection==1 else self.img_scaled
+        return super().get_draw_list() + [(img_scaled, (self.pos[0], self.pos[1]))]
+
+    def render_snapshot(self):
+        return (self.playDirection, tuple(self.pos), super().render_snapshot())
+
+    def get_bounds(self):
+        return pygame.Rect(self.pos, self.img_scaled.get_size())
 def draw_empty_card_pocket(holder, screen, width=None, height=None):
     """ Renders empty card pocket at the position of CardHolder object
     :param holder: CardsHolder object
@@ -115,16 +124,13 @@ class QNO_CardSprite(AbstractPygameCardSprite):
             raise ValueError('QNO_CardSprite.card_json is not initialized')
         AbstractPygameCardSprite.__init__(self, pos)
 
-        temp_image = pygame.image.load(get_img_full_path(
-            self.get_image_path(state, value))).convert_alpha()
-        self.image = pygame.transform.scale(temp_image, QNO_CardSprite.card_json["size"])
+        size = QNO_CardSprite.card_json["size"]
+        self.image = pygame_cards.card_sprite.load_scaled_image(self.get_image_path(state, value), size)
         self.rect = self.image.get_rect()
         self.rect[0] = pos[0]
         self.rect[1] = pos[1]
 
-        back_img_path = QNO_CardSprite.card_json["back_sprite_file"]
-        temp_image = pygame.image.load(get_img_full_path(back_img_path)).convert_alpha()
-        self.back_image = pygame.transform.scale(temp_image, QNO_CardSprite.card_json["size"])
+        self.back_image = pygame_cards.card_sprite.load_scaled_image(QNO_CardSprite.card_json["back_sprite_file"], size)
         self.back_up = back_up
 
     def get_render_tuple(self):
@@ -140,6 +146,7 @@ class QNO_CardSprite(AbstractPygameCardSprite):
     @back_up.setter
     def back_up(self, value):
         self._back_up = value
+        AbstractPygameCardSprite.turn_count += 1
 
     @staticmethod
     def get_image_path(state, value):
@@ -271,18 +278,21 @@ class Crazy8sController(controller.Controller):
 
         self.stockpile = deck.Deck(enums.DeckType.full, pos, offset, None)
         # self.stockpile = QNO_Deck(enums.DeckType.full, pos, offset, None)
+        self.stockpile.cache_lower_cards = True
         self.add_rendered_object(self.stockpile)
 
         # Set up the discard pile.
         pos = self.settings_json["discard"]["position"]
         offset = self.settings_json["discard"]["offset"]
-        self.discard = card_holder.CardsHolder(pos, offset)
+        self.discard = card_holder.CardsHolder(pos, offset, cache_lower_cards=True)
         self.add_rendered_object(self.discard)
 
         # Set up the player's hand.
         pos = self.settings_json["player_hand"]["position"]
         offset = self.settings_json["player_hand"]["offset"]
-        self.player_hand = card_holder.CardsHolder(pos, offset, enums.GrabPolicy.can_single_grab_any)
+        max_width = self.settings_json["player_hand"]["max_width"]
+        self.player_hand = card_holder.CardsHolder(pos, offset, enums.GrabPolicy.can_single_grab_any,
+                                                   max_width=max_width)
         self.add_rendered_object(self.player_hand)
 
         # set up direction arrow
@@ -295,8 +305,14 @@ class Crazy8sController(controller.Controller):
         # Other global behavior
         self.opponent_min_delay_ms = self.settings_json["opponent_behavior"]["min_delay_ms"]
         self.opponent_max_delay_ms = self.settings_json["opponent_behavior"]["max_delay_ms"]
+        self.opponent_move = None # Scheduled move of the AI opponent whose turn it is
         self.draw_speed = self.settings_json["card"]["draw_speed"] # Speed in pixels / second
         self.move_speed = self.settings_json["card"]["move_speed"] # Speed in pixels / second
+        self.check_state_with_qiskit = self.settings_json["quantum"]["check_with_qiskit"]
+        self.circuit_history_length = self.settings_json["quantum"]["circuit_history_length"]
+        self.circuit_compact_after = self.settings_json["quantum"]["circuit_compact_after"]
+        self.measurement_backend = measurement.create_backend(self.settings_json["quantum"]["measurement_backend"],
+                                                              self.settings_json["quantum"]["measurement_seed"])
 
         # Set up game state.
         self.num_opponents = 0
@@ -342,6 +358,10 @@ class Crazy8sController(controller.Controller):
         self.option_replenish_stack, self.option_replenish_stack_col = self.createToggleOption("option_replenish_stack", self.toggleOptionReplenishStack)
         self.option_free_drawing, self.option_free_drawing_col = self.createToggleOption("option_free_drawing", self.toggleOptionFreeDrawing)
         self.option_music_paused, self.option_music_paused_col = self.createToggleOption("option_music_paused", self.toggleOptionMusicPaused)
+        self.option_turbo, self.option_turbo_col = self.createToggleOption("option_turbo", self.toggleOptionTurbo)
+        self.option_autoplay, self.option_autoplay_col = self.createToggleOption("option_autoplay", self.toggleOptionAutoplay)
+        self.turbo = self.option_turbo
+        self.autoplay_info = None # AI profile that plays for the human player with autoplay on
 
 
         self.music_started = False
@@ -427,6 +447,39 @@ class Crazy8sController(controller.Controller):
                                       timeout=0, color=text_color, id_=self.option_music_paused_col.id_)
         print(j["button_text"], ':', self.option_music_paused)
 
+    def toggleOptionTurbo(self):
+        """AI players move without delay and cards land instantly, see Controller.turbo."""
+        self.option_turbo = not self.option_turbo
+        self.turbo = self.option_turbo
+        if self.option_turbo:
+            label_text = "On"
+        else:
+            label_text = "Off"
+        j = self.option_turbo_col.json_object
+        position = j["label"]["position"]
+        text_size = j["label"]["text_size"]
+        text_color = j["label"]["text_color"]
+        self.gui_interface.hide_by_id(self.option_turbo_col.id_)
+        self.gui_interface.show_label(position=position, text=label_text, text_size=text_size,
+                                      timeout=0, color=text_color, id_=self.option_turbo_col.id_)
+        print(j["button_text"], ':', self.option_turbo)
+
+    def toggleOptionAutoplay(self):
+        """An AI profile plays the human player's turns, to watch AI-only games."""
+        self.option_autoplay = not self.option_autoplay
+        if self.option_autoplay:
+            label_text = "On"
+        else:
+            label_text = "Off"
+        j = self.option_autoplay_col.json_object
+        position = j["label"]["position"]
+        text_size = j["label"]["text_size"]
+        text_color = j["label"]["text_color"]
+        self.gui_interface.hide_by_id(self.option_autoplay_col.id_)
+        self.gui_interface.show_label(position=position, text=label_text, text_size=text_size,
+                                      timeout=0, color=text_color, id_=self.option_autoplay_col.id_)
+        print(j["button_text"], ':', self.option_autoplay)
+
     # def togglePauseMusic(self):
     #     if self.option_music_paused:
     #         self.unpauseMusic()
@@ -580,7 +633,7 @@ class Crazy8sController(controller.Controller):
             currentState=discards[0][0]
             cardVal=discards[0][1]
 
-        qc=QuantumCircuit(2)
+        qc=qcircuit.GameCircuit()
 
         if currentState=="|11>":
             qc.x(0)
@@ -591,6 +644,8 @@ class Crazy8sController(controller.Controller):
             qc.x(0)
 
     def restart_game(self):
+        self.scheduler.cancel_all()  # Pending opponent moves belong to the old game
+        self.opponent_move = None
         for animation_ in self.animations:
             animation_.is_completed = True
         self.discard.move_all_cards(self.stockpile)
@@ -611,7 +666,8 @@ class Crazy8sController(controller.Controller):
     def start_game(self):
         print('=====>', 'NEW GAME!')
 
-        self.qc = QuantumCircuit(2)
+        self.qc = qcircuit.GameCircuit(self.circuit_history_length, self.circuit_compact_after)
+        self.qstate = qstate.TwoQubitState()
 
         self.stockpile.shuffle()
         self.show_status_notification("Starting game...")
@@ -620,8 +676,6 @@ class Crazy8sController(controller.Controller):
         self.setPlayDirection(0)
         self.show_current_state()
 
-        self.debug_enabled = True
-
     def on_choose_num_opponents(self, num_opponents):
         self.num_opponents = num_opponents
         self.hide_num_opponents_dialog()
@@ -639,10 +693,15 @@ class Crazy8sController(controller.Controller):
         width_per_opponent = width / self.num_opponents
         card_width = self.settings_json["card"]["size"][0]
         offset = self.settings_json["opponent_hand"]["offset"]
+        # Hands shrink to their share of the width and are stacked once they grow large.
+        max_width = width_per_opponent - self.settings_json["opponent_hand"]["margin"]
+        compact_threshold = self.settings_json["opponent_hand"]["compact_threshold"]
 
         for i in range(0, self.num_opponents):
             x = x_range[0] + ((i+0.5)*width_per_opponent) - (card_width/2)
-            hand = card_holder.CardsHolder((x, y), offset, enums.GrabPolicy.can_single_grab_any)
+            hand = card_holder.CardsHolder((x, y), offset, enums.GrabPolicy.can_single_grab_any,
+                                           max_width=max_width, compact_threshold=compact_threshold)
+            hand.count_badge_json = self.settings_json["opponent_hand"]["count_badge"]
             opponent_idx = randint(0, len(available_opponents)-1)
             opponent_json = available_opponents[opponent_idx]
             opponent_info = opponent.Opponent(opponent_json)
@@ -714,39 +773,40 @@ class Crazy8sController(controller.Controller):
         self.show_status_notification(deal_message)
         # num_cards = 7 if self.num_opponents == 1 else 5
         num_cards = 5
-        next_player = self.player_after(self.dealer)
-        deal_state = DealState(cards_per_player=num_cards, round=0, next_player=next_player)
-        self.deal_next_card(deal_state)
-
-    def deal_next_card(self, deal_state: DealState):
-        # print('deal_next_card')
-        """Deal the next card, in the middle of a deal."""
-        if deal_state.round >= deal_state.cards_per_player:
-            self.on_deal_done()
-            return
-
-        card_ = self.stockpile.pop_top_card()
-        if card_ is None:
-            raise Exception('Not enough cards.')
+        self.deal_cards(num_cards)
 
-        to_hand = self.player_hand\
-                    if deal_state.next_player == 0\
-                    else self.opponents[deal_state.next_player-1].hand
+    def deal_cards(self, cards_per_player):
+        """Deal cards_per_player cards to every player, one at a time, starting
+        with the player after the dealer. The cards fly at the same time, a
+        little apart, and are put into the hands once all have arrived.
+        """
+        moves = []
+        to_hands = []
+        player_idx = self.dealer
+        for i in range(cards_per_player * (self.num_opponents + 1)):
+            player_idx = self.player_after(player_idx)
+            to_hands.append(self.player_hand if player_idx == 0 else self.opponents[player_idx-1].hand)
+
+        # Aim at the places the cards have once all are dealt, so that they do not move when
+        # a hand gets squeezed (see CardsHolder.layout_offset()).
+        num_cards = {}  # Hand -> number of cards it holds after the deal
+        for to_hand in to_hands:
+            num_cards[to_hand] = num_cards.get(to_hand, len(to_hand.cards)) + 1
+        next_index = {to_hand: len(to_hand.cards) for to_hand in num_cards}
+        for to_hand in to_hands:
+            card_ = self.stockpile.pop_top_card()
+            if card_ is None:
+                raise Exception('Not enough cards.')
+            moves.append(([card_], to_hand.card_pos(next_index[to_hand], num_cards[to_hand])))
+            next_index[to_hand] += 1
+
+        def on_cards_dealt(holders):
+            for holder_, to_hand in zip(holders, to_hands):
+                back_side_up = to_hand != self.player_hand
+                holder_.move_all_cards(to_hand, back_side_up)
+            self.on_deal_done()
 
-        def on_card_dealt(holder_):
-            # Finish dealing the current card.
-            back_side_up = to_hand != self.player_hand
-            holder_.move_all_cards(to_hand, back_side_up)
-            
-            # Prepare next card to deal.
-            round_ = deal_state.round+1\
-                if deal_state.next_player == self.dealer\
-                else deal_state.round
-            next_player = self.player_after(deal_state.next_player)
-            next_deal_state = DealState(deal_state.cards_per_player, round_, next_player)
-            self.deal_next_card(next_deal_state)
-
-        self.animate_cards([card_], to_hand.next_card_pos, on_complete=on_card_dealt, speed=self.move_speed)
+        self.animate_card_moves(moves, on_complete=on_cards_dealt, speed=self.move_speed)
 
     def on_deal_done(self):
         # print('on_deal_done')
@@ -768,45 +828,11 @@ class Crazy8sController(controller.Controller):
         #     raise
         currentState = self.getCurrentState()
 
-        if currentState=="|00>":
-
-            if newState=="|11>":
-                self.qc.x(0)
-                self.qc.x(1)
-            elif newState=="|10>":
-                self.qc.x(1)
-            elif newState=="|01>":
-                self.qc.x(0)
-
-        elif currentState=="|01>":
-
-            if newState=="|11>":
-                self.qc.x(1)
-            elif newState=="|10>":
-                self.qc.x(0)
-                self.qc.x(1)
-            elif newState=="|00>":
-                self.qc.x(0)
-
-        elif currentState=="|10>":
-
-            if newState=="|11>":
-                self.qc.x(0)
-            elif newState=="|01>":
-                self.qc.x(0)
-                self.qc.x(1)
-            elif newState=="|00>":
-                self.qc.x(1)
-
-        elif currentState=="|11>":
-
-            if newState=="|10>":
-                self.qc.x(0)
-            elif newState=="|00>":
-                self.qc.x(0)
-                self.qc.x(1)
-            elif newState=="|01>":
-                self.qc.x(1)
+        # Flip every qubit that differs between the current and the new basis state.
+        for qubit in qstate.BASIS_FLIPS[(currentState, newState)]:
+            self.qc.x(qubit)
+            self.qstate.x(qubit)
+        self.check_qiskit_state()
 
         self.show_current_state()
 
@@ -876,14 +902,7 @@ class Crazy8sController(controller.Controller):
 
     def can_play_card(self, card_):
         """Whether it's legal to play the given card at this time."""
-        top_card = self.discard.cards[-1]
-        if card_.getState() == "Gate":
-            return True
-        if card_.getState() == self.getCurrentState(): #top_card.getState():
-            return True
-        if card_.getValue() == top_card.getValue():
-            return True
-        return False
+        return qno_engine.can_play(card_, self.getCurrentState(), self.discard.cards[-1])
 
         # state = card_.suit
         # value = card_.rank
@@ -898,10 +917,7 @@ class Crazy8sController(controller.Controller):
 
     def player_after(self, player_idx):
         '''Return the index of the next player, but without actually changing to him. Takes into account play direction.'''
-        if self.getPlayDirection()==0:
-            return (player_idx + 1) % (self.num_opponents + 1)
-        else:
-            return (player_idx - 1) % (self.num_opponents + 1)
+        return qno_engine.player_after(player_idx, self.getPlayDirection(), self.num_opponents + 1)
 
     def execute_game(self):
         # print('execute_game:')
@@ -909,6 +925,16 @@ class Crazy8sController(controller.Controller):
         for idx in range(0, self.num_opponents):
             # print('execute_game:idx:',idx)
             self.opponent_execute(idx)
+        self.autoplay_execute()
+
+    def autoplay_execute(self):
+        """With autoplay on, let an AI profile take the human player's turn."""
+        if self.option_autoplay and self.is_player_turn() and not self.action_lock:
+            if self.autoplay_info is None:
+                self.autoplay_info = opponent.Opponent(self.opponents_json[randint(0, len(self.opponents_json)-1)])
+            self.action_lock = True
+            def on_end_delay(): self.ai_play(0, self.player_hand, self.autoplay_info)
+            self.opponent_delay(on_end_delay)
 
     def opponent_execute(self, idx):
         '''
@@ -921,18 +947,11 @@ class Crazy8sController(controller.Controller):
         if self.turn == idx+1:
             # It's this opponent's turn.
             if not self.action_lock:
-                self.debug_info = 'opponent_execute called'
                 self.action_lock = True
                 def on_end_delay(): self.opponent_play(idx)
                 self.opponent_delay(on_end_delay)
-                self.debug_enabled = True
-            else:
-                if self.debug_enabled:
-                    # print(f"Opponent's turn, but self.action_lock={self.action_lock}")
-                    self.debug_enabled = False
         else:
             # player's turn
-            # self.debug_enabled = True
             pass
 
     def opponent_play(self, idx):
@@ -941,11 +960,17 @@ class Crazy8sController(controller.Controller):
         Called in a loop as long as it is that player's turn.
         '''
         opponent_ = self.opponents[idx]
-        hand = opponent_.hand
+        self.ai_play(idx+1, opponent_.hand, opponent_.info)
 
-        # print('opponent_play: idx:',idx,
+    def ai_play(self, player_idx, hand, info):
+        '''
+        Make one move for player **player_idx**, as decided by the AI profile **info**
+        (opponent.Opponent): choose a qbit, measure, play a card or draw one.
+        '''
+
+        # print('ai_play: player_idx:',player_idx,
         #       ', turn:', self.turn,
-        #       ', name:', opponent_.info.name,
+        #       ', name:', info.name,
         #       ', self.num_opponents:', self.num_opponents,
         #       ', Ncards(player):', len(hand.cards),
         #       ', Ncards(deck):', len(self.stockpile.cards))
@@ -954,15 +979,7 @@ class Crazy8sController(controller.Controller):
 
         if self.must_choose_suit:
             possible_states = self.getPossibleStates()
-            new_suit = opponent_.info.choose_suit(hand.cards, possible_states)
-            # if self.getCurrentValue()=="H": # in case we use an H gate
-            if len(possible_states)>2: # Happens in case of the H gate
-                tmp = new_suit
-                if new_suit in [0, 1]:
-                    new_suit = 0
-                else:
-                    new_suit = 1
-                print(f'H Gate: Converting chosen index: {tmp} -> {new_suit}')
+            new_suit = qno_engine.ai_qubit_choice(info, hand.cards, possible_states)
             self.on_choose_suit(new_suit) # calls unlockActions() at the end
         elif self.getCurrentStateLength()!=1:
             # measurement required
@@ -974,22 +991,22 @@ class Crazy8sController(controller.Controller):
             possible_measurements = self.getPossibleMeasurements()
             print('possible_measurements', possible_measurements)
 
-            prediction = random.choice(possible_measurements)
+            prediction = info.rng.choice(possible_measurements)
             self.measure(prediction)
         else:
             def on_complete():
                 if not hand.any_cards:
-                    self.game_over(idx+1)
+                    self.game_over(player_idx)
                 else:
                     self.action_lock = False
             top_discard = self.discard.cards[-1]
-            card_ = opponent_.info.try_select_card(hand.cards, top_discard, self.getCurrentState())
+            card_ = info.try_select_card(hand.cards, top_discard, self.getCurrentState())
             if card_ is not None:
                 card_ = hand.try_grab_card(card_)[0]
                 self.play_card(card_, on_complete)
             else:
                 if (not self.option_free_drawing) and self.hasPlayableCards(hand):
-                    msg = f"{opponent_.info.name} has playable cards!"
+                    msg = f"{info.name} has playable cards!"
                     self.show_player_prompt(msg)
                     for c in hand.cards:
                         print(c, self.can_play_card(c))
@@ -1001,45 +1018,20 @@ class Crazy8sController(controller.Controller):
             print(f'==> gate: {gate}')
             for q1 in range(2):
                 for q0 in range(2):
-                    print(f'|{q1}{q0}> -> {self.getPossibleStates(current_gate=gate, current_state=[q1,q0])}')
+                    state = self.convertStateTupleToString([q1, q0])
+                    print(f'{state} -> {self.getPossibleStates(current_gate=gate, current_state=state)}')
 
     def convertStateTupleToString(self, t):
         return f'|{t[0]}{t[1]}>'
 
     def getPossibleStates(self, current_gate=None, current_state=None):
-        '''Return possible states after using gate.'''
+        '''Return possible states after using gate, from the precomputed qstate.POSSIBLE_STATES table.'''
         if current_gate is None:
             current_gate = self.getCurrentValue()
         if current_state is None:
-            current_state = self.getCurrentState(as_tuple=True)
-
-        if current_gate=="X":
-            possible_states = []
-            for idx in [0,1]:
-                new_t = [current_state[0], current_state[1]]
-                new_t[idx] = (new_t[idx]+1)%2
-                possible_states.append( self.convertStateTupleToString(new_t) )
-            return possible_states
-        elif current_gate=="CNOT":
-            possible_states = []
-            for control_idx in [0,1]:
-                new_t = [current_state[0], current_state[1]]
-                if new_t[control_idx]==1:
-                    target_idx = (control_idx+1)%2
-                    new_t[target_idx] = (new_t[target_idx]+1)%2
-                possible_states.append( self.convertStateTupleToString(new_t) )
-            return possible_states
-        elif current_gate=="H":
-            possible_states = []
-            for idx in [0, 1]:
-                new_t = [current_state[0], current_state[1]]
-                for val in [0, 1]: # possible random result
-                    new_t[idx] = val
-                    possible_states.append( self.convertStateTupleToString(new_t) )
-            return possible_states
-
-        raise # error by default
-        return
+            current_state = self.getCurrentState()
+
+        return qstate.POSSIBLE_STATES[(current_state, current_gate)]
 
     def drawCardsForPlayer(self, num_cards, player_idx, on_complete=None):
         """Deal **num_cards** cards to player **player_idx**."""
@@ -1050,15 +1042,17 @@ class Crazy8sController(controller.Controller):
             f"You draw {num_cards}." if player_idx == 0\
             else f"{self.opponents[player_idx-1].info.name}  draws {num_cards}."
         self.show_status_notification(message)
-        deal_state = DealState(cards_per_player=num_cards, round=0, next_player=player_idx)
-        self.draw_next_card(deal_state, on_complete=on_complete)
+        self.draw_cards(num_cards, to_hand, on_complete=on_complete)
         return
 
     def cardsLeftInDeck(self):
         return len(self.stockpile.cards)
-    def draw_next_card(self, deal_state: DealState, on_complete=None):
-        """Draw the next card, in the middle of a card draw."""
-        if deal_state.round >= deal_state.cards_per_player:
+    def draw_cards(self, num_cards, to_hand, on_complete=None):
+        """Draw num_cards cards from the stockpile into to_hand, all at once, a
+        little apart. If the stockpile runs out, the rest is drawn after it was
+        repopulated.
+        """
+        if num_cards <= 0:
             # print('Drawing cards done.')
             if on_complete is not None:
                 on_complete()
@@ -1066,36 +1060,34 @@ class Crazy8sController(controller.Controller):
                 print('on_complete not defined.')
                 raise
             return
-        # print(f'draw_next_card, cardsLeftInDeck: {self.cardsLeftInDeck()}')
+        # print(f'draw_cards, cardsLeftInDeck: {self.cardsLeftInDeck()}')
 
         if not self.stockpile.any_cards:
-            self.repopulate_stockpile(None)
+            def on_repopulated():
+                if not self.stockpile.any_cards:
+                    print('No cards left in stockpile.')
+                    num_cards_ = 0
+                else:
+                    num_cards_ = num_cards
+                self.draw_cards(num_cards_, to_hand, on_complete=on_complete)
 
-        if not self.stockpile.any_cards:
-            print('No cards left in stockpile.')
+            self.repopulate_stockpile(on_repopulated)
             return
 
-        card_ = self.stockpile.pop_top_card()
-
-        to_hand = self.player_hand \
-            if deal_state.next_player == 0 \
-            else self.opponents[deal_state.next_player - 1].hand
+        cards = [self.stockpile.pop_top_card() for i in range(min(num_cards, self.cardsLeftInDeck()))]
+        num_cards_after = len(to_hand.cards) + len(cards)
+        moves = [([card_], to_hand.card_pos(len(to_hand.cards) + i, num_cards_after)) for i, card_ in enumerate(cards)]
 
-        def on_card_dealt(holder_):
-            # Finish dealing the current card.
+        def on_cards_drawn(holders):
             back_side_up = to_hand != self.player_hand
-            for i in holder_.cards:
-                player_idx = self.getPlayerIndexFromHand(to_hand)
-                print(f'drawCardsForPlayer: Player {player_idx} ({self.getPlayerName(player_idx)}) drew {i}')
-            holder_.move_all_cards(to_hand, back_side_up)
-
-            # Prepare next card to deal.
-            round_ = deal_state.round + 1
-            next_player = deal_state.next_player
-            next_deal_state = DealState(deal_state.cards_per_player, round_, next_player)
-            self.draw_next_card(next_deal_state, on_complete=on_complete)
+            player_idx = self.getPlayerIndexFromHand(to_hand)
+            for holder_ in holders:
+                for i in holder_.cards:
+                    print(f'drawCardsForPlayer: Player {player_idx} ({self.getPlayerName(player_idx)}) drew {i}')
+                holder_.move_all_cards(to_hand, back_side_up)
+            self.draw_cards(num_cards - len(cards), to_hand, on_complete=on_complete)
 
-        self.animate_cards([card_], to_hand.next_card_pos, on_complete=on_card_dealt, speed=self.draw_speed)
+        self.animate_card_moves(moves, on_complete=on_cards_drawn, speed=self.draw_speed)
 
     def after_playing_card(self, card_, players_to_skip=0, on_complete=None, game_start=False):
         self.chosen_suit = None
@@ -1333,21 +1325,13 @@ class Crazy8sController(controller.Controller):
 
         ##### perform measurement
         self.qc.measure_all() # Adds measurement to all qubits.
-        job = execute(self.qc, Aer.get_backend('qasm_simulator'), shots=1) # perform measurement
-        # we can get the result of the outcome as follows
-        counts = job.result().get_counts(self.qc)
-        # print(counts)  # counts is a dictionary
-        if len(counts.keys()) > 1:
-            raise
-        result = list(counts.keys())[0] # result in 'ab' form
+        result = self.measurement_backend.measure(self.qstate, self.qc) # result in 'ab' form
         # print('result', f'|{result}>')
 
         ##### re-initialize quantum circuit with measured value, so we can use Statevector again.
-        self.qc = QuantumCircuit(2)
-        self.qc.initialize(result, self.qc.qubits)
-
-        statevector = Statevector(self.qc)  # works
-        # print(statevector.probabilities_dict())
+        self.qc.initialize(result)
+        self.qstate.initialize(result)
+        self.check_qiskit_state()
 
         new_state = self.getCurrentState()
         msg = f'Performed measurement: {old_state} -> {new_state}. The guess was: {prediction}. Guess correct: {prediction==new_state}'
@@ -1369,7 +1353,8 @@ class Crazy8sController(controller.Controller):
         self.show_dialog_title(msg)
         print(msg)
 
-        # Release lock after measurement is done.
+        # Hold the lock while the cards are drawn, release it after measurement is done.
+        self.action_lock = True
         def on_complete():
             self.bg_pulse_animation.is_completed = True
             self.next_turn()
@@ -1400,24 +1385,11 @@ class Crazy8sController(controller.Controller):
         self.measurement_required = False
 
         # apply gate
-        top_card = self.discard.cards[-1]
-        if top_card.getValue() == "X":
-            msg = f"X Gate played: Applying qc.x({suit.qiskit_index})"
-            print(msg)
-            self.qc.x(suit.qiskit_index)
-        elif top_card.getValue() == "H":
-            msg = f"H Gate played: Applying qc.h({suit.qiskit_index})"
-            print(msg)
-            self.qc.h(suit.qiskit_index)
-            self.measurement_required = True
-        elif top_card.getValue() == "CNOT":
-            c = suit.qiskit_index
-            t = (suit.qiskit_index+1)%2
-            msg = f"CNOT Gate played: Applying qc.cx({c}, {t})"
-            print(msg)
-            self.qc.cx(c, t)
-        else:
-            raise
+        gate = self.discard.cards[-1].getValue()
+        print(f"{gate} Gate played on qubit {suit.qiskit_index}")
+        qno_engine.apply_gate(self.qc, gate, suit.qiskit_index)
+        self.measurement_required = qno_engine.apply_gate(self.qstate, gate, suit.qiskit_index)
+        self.check_qiskit_state()
 
         print('state change:', old_state, '->', self.getCurrentState(allow_superposition=True))
         self.show_current_state() # Update state information display.
@@ -1427,9 +1399,9 @@ class Crazy8sController(controller.Controller):
             self.next_turn()
             self.action_lock = False
         else:
-            if self.turn==0: # human player
+            if self.turn==0 and not self.option_autoplay: # human player
                 self.show_measurement_dialog()
-            else: # computer player
+            else: # computer player, or autoplay
                 self.action_lock = False # further processing will be done in the main handler to mirror behaviour of the human handling
 
     def draw_card_from_stockpile(self, on_complete=None, player_idx=None):
@@ -1465,7 +1437,7 @@ class Crazy8sController(controller.Controller):
             score[self.opponents[idx].info.name] = len(self.opponents[idx].hand.cards)
 
         # turn into a sorted list, with support for ties
-        score_board = process_score(score)
+        score_board = qno_engine.process_score(score)
         return score_board
 
 
@@ -1491,26 +1463,37 @@ class Crazy8sController(controller.Controller):
         if not self.option_replenish_stack:
             self.end_game()
             return
-        self.repopulate_stockpile_card(on_complete)
+        self.repopulate_stockpile_cards(on_complete)
 
-    def repopulate_stockpile_card(self, on_complete):
-        if len(self.discard.cards) <= 1:
+    def repopulate_stockpile_cards(self, on_complete):
+        """Move all cards of the discard pile but the top one back to the
+        stockpile, as one pile in a single animation, then shuffle it."""
+        cards = self.discard.pop_bottom_cards(len(self.discard.cards) - 1)
+        if len(cards) == 0:
             self.stockpile.shuffle()
             if on_complete is not None: on_complete()
-        else:
-            def on_card_move(holder_):
-                card_ = holder_.pop_top_card()
-                self.stockpile.add_card(card_)
-                self.repopulate_stockpile_card(on_complete)
+            return
 
-            card_ = self.discard.pop_bottom_card()
+        for card_ in cards:
             card_.back_up = True
-            self.animate_cards([card_], self.stockpile.next_card_pos, on_complete=on_card_move, speed=self.move_speed)
+
+        def on_pile_move(holder_):
+            self.stockpile.add_cards(holder_.pop_bottom_cards(len(holder_.cards)))
+            self.stockpile.shuffle()
+            if on_complete is not None: on_complete()
+
+        self.animate_cards(cards, self.stockpile.next_card_pos, on_complete=on_pile_move, speed=self.move_speed)
 
     def opponent_delay(self, on_delay_complete):
         """Simulate AI opponent waiting before making its move."""
-        delay_ms = randint(self.opponent_min_delay_ms, self.opponent_max_delay_ms)
-        threading.Timer(delay_ms / 1000, on_delay_complete).start()
+        delay_ms = 0 if self.turbo else randint(self.opponent_min_delay_ms, self.opponent_max_delay_ms)
+        self.opponent_move = self.scheduler.schedule(delay_ms, on_delay_complete)
+
+    def is_idle(self):
+        # An opponent whose turn it is gets started by execute_game() on the next frame, as
+        # is the human player's turn with autoplay on.
+        opponent_to_start = (self.turn > 0 or (self.turn == 0 and self.option_autoplay)) and not self.action_lock
+        return super().is_idle() and not opponent_to_start
 
     def game_over(self, winner_idx=None):
         # print game end
@@ -1595,35 +1578,35 @@ class Crazy8sController(controller.Controller):
     def show_dialog_title(self, text, color=None):
         self.show_message(text, self.settings_json["gui"]["dialog"]["title"], DIALOG_TITLE, color)
 
+    def check_qiskit_state(self):
+        """Optional cross-check of the native state tracker against a full qiskit simulation
+        of the game circuit. Enabled with "quantum": {"check_with_qiskit": true} in settings2.json.
+        """
+        if not self.check_state_with_qiskit:
+            return
+        from qiskit.quantum_info import Statevector
+        prob_dict = Statevector(self.qc.circuit).probabilities_dict()
+        if not self.qstate.matches(prob_dict):
+            raise Exception(f'Native state {self.qstate.probabilities_dict()} does not match qiskit state {prob_dict}')
+
     def getCurrentStateLength(self):
-        statevector = Statevector(self.qc)
-        prob_dict = statevector.probabilities_dict()
-        return len(prob_dict)
+        return len(self.qstate.probabilities_dict())
 
     def getPossibleMeasurements(self):
         '''Return the possible measurment results.'''
-        statevector = Statevector(self.qc)
-        prob_dict = statevector.probabilities_dict()
-        L = [f'|{k}>' for k in prob_dict.keys()]
-        return L
+        return self.qstate.kets()
 
     def getCurrentState(self, as_tuple=False, allow_superposition=False):
-        statevector = Statevector(self.qc)
-        # print(statevector)
-        # print(statevector.probabilities())
-        # print(statevector.probabilities_dict())
-        prob_dict = statevector.probabilities_dict()
+        prob_dict = self.qstate.probabilities_dict()
 
         # special handling of superposition
         if len(prob_dict) != 1:
             if (not allow_superposition) or as_tuple:
                 raise Exception(f'More than one possible value: prob_dict={prob_dict}')
             else:
-                L = [f'|{k}>' for k in prob_dict.keys()]
-                s = '+'.join(L)
-                return s
+                return str(self.qstate)
 
-        s = f'|{list(prob_dict.keys())[0]}>'
+        s = self.qstate.kets()[0]
         if as_tuple:
             return [int(s[1]), int(s[2])]
         else:
@@ -1694,10 +1677,8 @@ class Crazy8sController(controller.Controller):
             self.show_player_prompt("It's not your turn!")
 
     def hasPlayableCards(self, hand):
-        for card_ in hand.cards:
-            if self.can_play_card(card_):
-                return True
-        return False
+        playable = qcards.playable_mask(self.getCurrentState(), self.discard.cards[-1].getValue())
+        return bool(qcards.hand_mask(hand.cards) & playable)
 
     def create_bgcolor_pulse_animation(self, color1, color2, period_ms):
         """Set up animation to pulse the background between given colors.
@@ -1738,29 +1719,6 @@ def hack_json():
         for k,v in json_dict.items():
             print(k,v)
 
-def process_score(score):
-    score_board = []
-
-    unique_scores = set()
-    for k,v in score.items():
-        unique_scores.add(v)
-
-    unique_scores = list(unique_scores)
-    unique_scores.sort()
-    # print(unique_scores)
-
-    for s in unique_scores:
-        player_list = []
-        for k, v in score.items():
-            if v == s:
-                player_list.append(k)
-        score_board.append( (s, player_list) )
-
-    # score_sorted = {k: v for k, v in sorted(score.items(), key=lambda item: item[1])}
-    # for k, v in score_sorted.items():
-    #     print(k, v)
-    return score_board
-
 def printScoreBoard(score_board):
     for idx, e in enumerate(score_board):
         cards_left = e[0]
@@ -1780,7 +1738,7 @@ def test_score():
     score['e']=9
     score['f']=90
 
-    score_board = process_score(score)
+    score_board = qno_engine.process_score(score)
     printScoreBoard(score_board)
     for k in score.keys():
         print(k, didPlayerWin(k, score_board))
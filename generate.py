@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import os
+import sys
+import json
+import math
+import argparse
 import subprocess
 import QNO
 from QNO import color
 
+ATLAS_COLUMNS = 8
+
 def removeBraKets(s):
   states=["|00>","|01>","|10>","|11>"]
   if s in states:
@@ -12,7 +18,55 @@ def removeBraKets(s):
   else:
     return s
 
-def main():
+def build_atlas(settings_path='settings2.json', sizes=None):
+    """ Pack the card images and the back side into one atlas image per settings, with a JSON
+    index of the sub-rect of every image.
+    :param settings_path: settings file with the "card" node (sprite paths, size and atlas_file)
+    :param sizes: list of (width, height) card sizes to include (default: the configured size)
+    """
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', 'hide')
+    import pygame
+
+    with open(settings_path, 'r') as json_file:
+        card_json = json.load(json_file)["card"]
+    if sizes is None:
+        sizes = [card_json["size"]]
+    atlas_json_path = card_json["atlas_file"]
+
+    # One entry per distinct image, keyed by the path the sprites are loaded from.
+    paths = []
+    for state, value in QNO.buildDeck():
+        path = card_json["front_sprite_path"] + f'card_{value}_{removeBraKets(state)}.png'
+        if path not in paths:
+            paths.append(path)
+    paths.append(card_json["back_sprite_file"])
+    images = {path: pygame.image.load(path) for path in paths}
+
+    rows = math.ceil(len(paths) / ATLAS_COLUMNS)
+    atlas_width = ATLAS_COLUMNS * max(w for w, h in sizes)
+    atlas_height = rows * sum(h for w, h in sizes)
+    atlas = pygame.Surface((atlas_width, atlas_height), pygame.SRCALPHA, 32)
+
+    index = {}
+    y0 = 0
+    for w, h in sizes:
+        rects = {}
+        for i, path in enumerate(paths):
+            x = (i % ATLAS_COLUMNS) * w
+            y = y0 + (i // ATLAS_COLUMNS) * h
+            atlas.blit(pygame.transform.scale(images[path], (w, h)), (x, y))
+            rects[path] = [x, y, w, h]
+        index[f'{w}x{h}'] = rects
+        y0 += rows * h
+
+    atlas_image_path = os.path.splitext(atlas_json_path)[0] + '.png'
+    pygame.image.save(atlas, atlas_image_path)
+    with open(atlas_json_path, 'w') as json_file:
+        json.dump({"image": os.path.basename(atlas_image_path), "sprites": index}, json_file, indent='\t')
+        json_file.write('\n')
+    print(f'Atlas with {len(paths)} images at sizes {sizes} written to {atlas_image_path} and {atlas_json_path}')
+
+def generate_cards():
     deck = QNO.buildDeck()
 
     IMGDIR='img/cards'
@@ -57,5 +111,16 @@ def main():
         y+=1
         print("")
 
+def main():
+    parser = argparse.ArgumentParser(description='Generate the card images and the card texture atlas.')
+    parser.add_argument('--atlas-only', action='store_true', help='only rebuild the atlas from the existing card images')
+    parser.add_argument('--size', nargs=2, type=int, action='append', metavar=('WIDTH', 'HEIGHT'),
+                        help='card size to include in the atlas (repeatable, default: the size in settings2.json)')
+    args = parser.parse_args()
+
+    if not args.atlas_only:
+        generate_cards()
+    build_atlas(sizes=args.size)
+
 if __name__ == "__main__":
     main()
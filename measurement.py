@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Measurement backends for QNO.
+
+A backend collapses the current two-qubit state to one basis state. The default
+SamplingBackend draws the outcome directly from the tracked amplitudes, which takes
+microseconds. AerBackend runs the game circuit on qiskit's qasm simulator instead, as the
+original game did, and is kept as an opt-in "real simulator" path.
+"""
+import abc
+import random
+
+
+class MeasurementBackend(object, metaclass=abc.ABCMeta):
+    """ Abstract interface class for measurement backends.
+
+    Following methods are mandatory for all classes that derive from MeasurementBackend:
+        - measure(state, circuit)
+    """
+
+    @abc.abstractmethod
+    def measure(self, state, circuit):
+        """ Measure both qubits.
+        :param state: qstate.TwoQubitState with the current amplitudes
+        :param circuit: qcircuit.GameCircuit, with measurements already added
+        :return: measured basis state as a 'q1q0' string
+        """
+        pass
+
+
+class SamplingBackend(MeasurementBackend):
+    """ Samples the outcome from the state's probabilities with its own seeded RNG. """
+
+    def __init__(self, seed=None, rng=None):
+        """
+        :param seed: seed for the backend's random.Random instance (None: seeded from the OS)
+        :param rng: random.Random-like object to use instead, e.g. to share a game's RNG stream
+        """
+        self.rng = random.Random(seed) if rng is None else rng
+
+    def measure(self, state, circuit=None):
+        probabilities = state.probabilities_dict()
+        u = self.rng.random()
+        accum = 0
+        for key, p in probabilities.items():
+            accum += p
+            if u < accum:
+                return key
+        return key  # Guard against rounding: the total may be a hair below 1.
+
+
+class AerBackend(MeasurementBackend):
+    """ Runs one shot of the game circuit on qiskit Aer's qasm simulator. """
+
+    def measure(self, state, circuit):
+        from qiskit import execute, Aer
+
+        job = execute(circuit.circuit, Aer.get_backend('qasm_simulator'), shots=1)
+        counts = job.result().get_counts(circuit.circuit)
+        if len(counts.keys()) > 1:
+            raise Exception(f'Expected a single measurement outcome, got: {counts}')
+        return list(counts.keys())[0] # result in 'ab' form
+
+
+backends = {
+    "sampling": SamplingBackend,
+    "aer": AerBackend,
+}
+
+
+def create_backend(name, seed=None):
+    """ Create a measurement backend by name.
+    :param name: "sampling" (default, native) or "aer" (qiskit simulator)
+    :param seed: seed for backends that use their own RNG
+    :return: MeasurementBackend object
+    """
+    if name not in backends:
+        raise ValueError(f'Unknown measurement backend: {name}. Available: {", ".join(backends)}')
+    if name == "sampling":
+        return SamplingBackend(seed)
+    return backends[name]()
@@ -2,10 +2,17 @@
 # -*- coding: utf-8 -*-
 import random
 
+import qcards
+
 class Opponent:
-    def __init__(self, json_profile):
+    def __init__(self, json_profile, rng=None):
+        """
+        :param json_profile: One entry of opponents.json.
+        :param rng: random.Random-like object used for all decisions (default: the random module).
+        """
         self.name = json_profile["name"]
         self.methods = list(json_profile["methods"].items())
+        self.rng = random if rng is None else rng
 
         # disable gate playing
         self.exclude_gates = False
@@ -17,17 +24,15 @@ class Opponent:
         :param chosen_suit: Explicitly-chosen suit (if top card is 8).
         :return: Selected card to play, or None if there are no moves.
         """
-        if len(cards)>10:
-            print('--------------')
-            for i in cards:
-                print(i)
-            print('--------------')
+        if not qcards.hand_mask(cards) & qcards.playable_mask(current_state, top_discard.rank):
+            return None # No method can find a card.
+
         methods = list(self.methods)
         selected_card = None
         # suit = current_state # if top_discard.rank == 8 else top_discard.suit
 
         while any(methods):
-            method = self.choose_method(methods)
+            method = self.choose_method(methods, self.rng)
             methods.remove(method) # So we don't choose it again.
 
             if method[0] == "suit":
@@ -43,44 +48,23 @@ class Opponent:
 
         return selected_card # Which ought to be None by this point.
 
-    def getTally(self, cards, states):
-        '''
-        cards: cards to consider
-        states: states to tally
-        '''
-        # Tally cards by suit.
-        tally = {i:0 for i in range(0,len(states))}
-
-        for card_ in cards:
-            # if card_.suit=='Gate':
-            #     s=4
-            # else:
-            #     s=card_.suit
-            if card_.suit in states:
-                state_idx = states.index(card_.suit)
-                tally[state_idx] += 1
-
-        info = 'Player card tally: '
-        for state_idx, state in enumerate(states):
-            if state_idx==0:
-                info += f'{state}: {tally[state_idx]}'
-            else:
-                info += f', {state}: {tally[state_idx]}'
-        info = info.strip()
-
-        suit_with_most_cards_idx = max(tally, key=tally.get)
-
-        print(info)
-        print('suit_with_most_cards: idx:', suit_with_most_cards_idx, '->', states[suit_with_most_cards_idx], ':', tally[suit_with_most_cards_idx])
-
-        return (info, tally, suit_with_most_cards_idx)
-
     def choose_suit(self, cards, possible_states):
-        """Having played a gate previously, make the necessary qbit choices."""
-        all_states = ["|00>", "|01>", "|10>", "|11>", "Gate"]
-        (all_info, all_tally, all_suit_with_most_cards_idx) = self.getTally(cards, all_states)
-        (possible_info, possible_tally, possible_suit_with_most_cards_idx) = self.getTally(cards, possible_states)
-        return possible_suit_with_most_cards_idx
+        """Having played a gate previously, make the necessary qbit choices.
+        :param cards: Opponent's hand of cards (list)
+        :param possible_states: States reachable for each choice, as listed in qstate.POSSIBLE_STATES.
+        :return: Index in possible_states of the state with the most matching cards in hand.
+        """
+        best_idx = 0
+        best_count = -1
+        for state_idx, state in enumerate(possible_states):
+            count = 0
+            for card_ in cards:
+                if card_.suit == state:
+                    count += 1
+            if count > best_count:
+                best_idx = state_idx
+                best_count = count
+        return best_idx
 
     def try_select_card_by_suit(self, cards, suit):
         """Try to select a card with suit that matches that of top discard.
@@ -96,7 +80,7 @@ class Opponent:
         else:
             matching_cards = [card_ for card_ in cards if card_.suit == suit]
         if any(matching_cards):
-            return random.choice(matching_cards)
+            return self.rng.choice(matching_cards)
 
     def try_select_card_by_rank(self, cards, rank):
         """Try to select a card with rank that matches that of top discard.
@@ -112,7 +96,7 @@ class Opponent:
         else:
             matching_cards = [card_ for card_ in cards if card_.rank == rank]
         if any(matching_cards):
-            return random.choice(matching_cards)
+            return self.rng.choice(matching_cards)
 
     def try_select_eight(self, cards):
         """Try to select an 8 card.
@@ -128,7 +112,7 @@ class Opponent:
         #     i.printInfos()
         # print('----------------')
         if any(matching_cards):
-            return random.choice(matching_cards)
+            return self.rng.choice(matching_cards)
 
     def try_select_card_at_random(self, cards, suit, rank):
         """Try to select a card at random that matches that of top discard.
@@ -146,14 +130,16 @@ class Opponent:
         else:
             matching_cards = [card_ for card_ in cards if (card_.suit == suit or card_.rank == rank)]
         if any(matching_cards):
-            return random.choice(matching_cards)
+            return self.rng.choice(matching_cards)
 
     @staticmethod
-    def choose_method(methods):
-        total_weight = sum(i[1] for i in methods)
-        choice = random.randint(1, total_weight)
+    def choose_method(methods, rng=random):
+        total_weight = 0
+        for method in methods:
+            total_weight += method[1]
+        choice = rng.randrange(total_weight)  # same draw as randint(1, total_weight) - 1
         accum = 0
         for method in methods:
             accum += method[1]
-            if accum >= choice:
+            if accum > choice:
                 return method
@@ -354,14 +354,15 @@ class Animation(object, metaclass=abc.ABCMeta):
     Following members are mandatory for all classes that derive from Animation:
         - update() - Update animation
     """
-    def __init__(self, on_complete=None):
+    def __init__(self, on_complete=None, delay_ms=0):
         """Initializes object.
         :param on_complete: Optional callback function to call when
             animation completes.
             Function takes no arguments and is not expected to return anything.
+        :param delay_ms: Optional delay in milliseconds before the animation starts.
         """
         self.on_complete = on_complete
-        self.start_time = time.time()
+        self.start_time = time.time() + delay_ms / 1000
         self._is_completed = False
 
     @property
@@ -390,7 +391,7 @@ class PositionAnimation(Animation, metaclass=abc.ABCMeta):
     Following methods are mandatory for all classes that derive from PositionAnimation:
         - update_pos(pos) - Update position of animated item (whatever it is)
     """
-    def __init__(self, plotter, on_complete=None):
+    def __init__(self, plotter, on_complete=None, delay_ms=0):
         """Initializes object.
         :param plotter: Object that plots position over time for the animation.
         :param on_complete: Optional callback function to call when
@@ -398,14 +399,16 @@ class PositionAnimation(Animation, metaclass=abc.ABCMeta):
             call update() with an elapsed time that the plotter determines is
             past its expected duration.
             Function takes no arguments and is not expected to return anything.
+        :param delay_ms: Optional delay in milliseconds before the animation starts.
+            Until then, the animated item stays at the start position.
         """
-        Animation.__init__(self, on_complete)
+        Animation.__init__(self, on_complete, delay_ms)
         self.plotter = plotter
 
     def update(self):
         """Advance the animation forward (based on elapsed time.)
         """
-        elapsed_ms = (time.time() - self.start_time) * 1000
+        elapsed_ms = max(0, (time.time() - self.start_time) * 1000)
 
         if not self.is_completed:
             (curr_pos, is_completed) = self.plotter.plot(elapsed_ms)
@@ -424,7 +427,7 @@ class PositionAnimation(Animation, metaclass=abc.ABCMeta):
 class CardsHolderAnimation(PositionAnimation):
     """Animates a card holder from one position to another.
     """
-    def __init__(self, holder, plotter, on_complete=None):
+    def __init__(self, holder, plotter, on_complete=None, delay_ms=0):
         """Initializes object.
         :param holder: CardsHolder object that will be animated.
         :param plotter: Object that plots position over time for the animation.
@@ -433,8 +436,9 @@ class CardsHolderAnimation(PositionAnimation):
             call update() with an elapsed time that the plotter determines is
             past its expected duration.
             Function takes no arguments and is not expected to return anything.
+        :param delay_ms: Optional delay in milliseconds before the holder starts moving.
         """
-        PositionAnimation.__init__(self, plotter, on_complete)
+        PositionAnimation.__init__(self, plotter, on_complete, delay_ms)
         self.holder = holder
     
     def update_pos(self, new_pos):
@@ -19,10 +19,14 @@ class color:
 class Card(game_object.GameObject):
     """ This class represents a card. """
 
-    def __init__(self, suit, rank, pos, back_up=False):
+    def __init__(self, suit, rank, pos, back_up=False, card_id=None):
+        """
+        :param card_id: index of the card in the deck (see qcards), used for bitmask legality checks
+        """
         game_object.GameObject.__init__(self)
         self.suit = suit
         self.rank = rank
+        self.card_id = card_id
         self.sprite = card_sprite.CardSprite(suit, rank, pos, back_up)
         self._back_up = back_up
 
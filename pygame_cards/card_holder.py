@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 try:
     import sys
+    import math
     import operator
     import pygame
 
-    from pygame_cards import game_object, card, enums
+    from pygame_cards import game_object, card, card_sprite, enums, gui
 except ImportError as err:
     print("Fail loading a module in file:", __file__, "\n", err)
     sys.exit(2)
@@ -24,20 +25,42 @@ class CardsHolder(game_object.GameObject):
     opponent_idx = None
     player_idx = None
     opponent_name = None
+    lower_cards_cache_min = 3  # Visible cards below the top one needed to use the cache
+    # Badge with the number of cards drawn on compact holders (see compact_threshold).
+    count_badge_json = {"text_size": 20, "text_color": [255, 255, 255], "background_color": [0, 0, 0]}
+    # Cards are always laid out at card_pos(index), so hit tests can compute which cards are
+    # at a position instead of testing them all. Holders that place cards otherwise turn it off.
+    fixed_layout = True
 
     def __init__(self, pos=(0, 0), offset=(0, 0), grab_policy=enums.GrabPolicy.no_grab,
-                 last_card_callback=None):
+                 last_card_callback=None, cache_lower_cards=False, max_width=None,
+                 compact_threshold=None):
         """
         :param pos: tuple with coordinates (x, y) - position of top left corner of cards holder
         :param offset: tuple (x, y) with values of offset between cards in the holder
         :param grab_policy: value from enums.GrabPolicy (by default enums.GrabPolicy.no_grab)
         :param last_card_callback: function to be called once the last card removed (default None)
+        :param cache_lower_cards: True to draw the cards below the top one from one cached surface,
+            for piles that change rarely compared to how often they are rendered
+        :param max_width: width in pixels the cards may take at most. The offset shrinks as
+            cards are added once they would not fit anymore. None for no limit.
+        :param compact_threshold: number of cards above which the cards are stacked on top of
+            each other and only the top one is drawn, with a badge showing the number of cards.
+            None to never stack them.
         """
         self.cards = []
         game_object.GameObject.__init__(self, self.cards, grab_policy)
         self.last_card_callback = last_card_callback
         self.pos = pos
         self.offset = offset
+        self.cache_lower_cards = cache_lower_cards
+        self._lower_cards_cache = None  # (render tuples of the cached cards, surface, position)
+        self.max_width = max_width
+        self.compact_threshold = compact_threshold
+        self._stale_from = None  # Index of the lowest card whose position is out of date
+        self._layout_offset = tuple(offset)  # Offset the cards were last laid out with
+        self._count_badge = None  # (number of cards, badge surface)
+        self._snapshot = None  # (card turn count, render_snapshot()), until the holder changes
 
     @property
     def top_card_pos(self):
@@ -45,6 +68,7 @@ class CardsHolder(game_object.GameObject):
         or if no cards, position of holder.
         """
         if len(self.cards) > 0:
+            self.layout()
             return self.cards[-1].get_pos()
         else:
             return self.pos
@@ -53,11 +77,47 @@ class CardsHolder(game_object.GameObject):
     def next_card_pos(self):
         """Position of next card to be added, if it were added.
         """
+        if self.fixed_layout:
+            return self.card_pos(len(self.cards), len(self.cards) + 1)
         curr_pos = self.top_card_pos
         if len(self.cards) == 0:
             return curr_pos
         else:
-            return (curr_pos[0] + self.offset[0], curr_pos[1] + self.offset[1])
+            offset_ = self.layout_offset()
+            return (curr_pos[0] + offset_[0], curr_pos[1] + offset_[1])
+
+    def card_pos(self, index, num_cards=None):
+        """Position of the card at the given index, e.g. where the n-th of
+        several cards that are yet to be added will end up.
+        :param index: Index in self.cards, may be past the top card.
+        :param num_cards: Number of cards in the holder once the card is there, which
+            sets the offset of squeezed or compact holders (default: current number).
+        """
+        offset_ = self.layout_offset(num_cards)
+        return (self.pos[0] + index * offset_[0], self.pos[1] + index * offset_[1])
+
+    @property
+    def is_compact(self):
+        """True if the cards are stacked on top of each other, see compact_threshold."""
+        return self.compact_threshold is not None and len(self.cards) > self.compact_threshold
+
+    def layout_offset(self, num_cards=None):
+        """Offset between the cards as they are laid out for the given number of cards:
+        zero if the holder is compact, shrunk to fit in max_width, or else self.offset.
+        :param num_cards: Number of cards (default: current number).
+        :return: tuple (x, y)
+        """
+        if num_cards is None:
+            num_cards = len(self.cards)
+        if self.compact_threshold is not None and num_cards > self.compact_threshold:
+            return (0, 0)
+        if self.max_width is not None and num_cards > 1 and self.offset[0] != 0:
+            fan_width = (num_cards - 1) * abs(self.offset[0])
+            room = max(0, self.max_width - CardsHolder.card_json["size"][0])
+            if fan_width > room:
+                scale = room / fan_width
+                return (self.offset[0] * scale, self.offset[1] * scale)
+        return tuple(self.offset)
 
     @property
     def any_cards(self):
@@ -70,7 +130,7 @@ class CardsHolder(game_object.GameObject):
         """
         if len(self.cards) != 0:
             # Check if any card clicked.
-            return any(card_.is_clicked(pos) for card_ in self.cards)
+            return self.card_at(pos)[0] is not None
         else:
             # No cards, but check if the holder's empty area clicked.
             return \
@@ -84,6 +144,7 @@ class CardsHolder(game_object.GameObject):
         :param pos: tuple with coordinates (x, y) - position of mouse click/screen touch.
         :return: True if top card is clicked, False otherwise
         """
+        self.layout()
         return len(self.cards) != 0 and self.cards[-1].is_clicked(pos)
 
     def try_grab_card_at(self, pos):
@@ -105,13 +166,16 @@ class CardsHolder(game_object.GameObject):
         grabbed_cards = None
 
         if card_ is not None and self.can_grab_card(card_):
+            self.layout()
             index = self.cards.index(card_)
 
             if self.grab_policy == enums.GrabPolicy.can_multi_grab:
                 if index == 0 and self.last_card_callback is not None:
                     self.last_card_callback(self.cards[0])
-                grabbed_cards = [c for c in self.cards if self.cards.index(c) >= index]
-                self.cards[:] = [c for c in self.cards if self.cards.index(c) < index]
+                # Cards below the grabbed ones keep their positions.
+                grabbed_cards = self.cards[index:]
+                del self.cards[index:]
+                self.update_position_from(index)
             else:
                 grabbed_cards = [self.pop_card(index)]
 
@@ -137,7 +201,12 @@ class CardsHolder(game_object.GameObject):
         :return: tuple of card being touched (or None),
             mouse offset of card position from given position (or None)
         """
-        for card_ in reversed(self.cards):
+        self.layout()
+        if self.fixed_layout:
+            cards = (self.cards[i] for i in reversed(self.card_index_range(pos)))
+        else:
+            cards = reversed(self.cards)
+        for card_ in cards:
             if card_.is_clicked(pos):
                 card_pos = card_.get_pos()
                 return (\
@@ -146,6 +215,33 @@ class CardsHolder(game_object.GameObject):
 
         return (None, None)
 
+    def card_index_range(self, pos):
+        """Indices of the cards that may be at a given position, computed
+        from the position and offset of the holder. Card positions are whole
+        pixels, so the range has a pixel of slack at both ends.
+        :param pos: tuple with coordinates (x, y) - position on screen.
+        :return: range of indices, empty if no card can be at pos
+        """
+        if len(self.cards) == 0:
+            return range(0)
+        self.layout()
+        first, last = 0, len(self.cards) - 1
+        top_rect = self.cards[-1].sprite.rect
+        offset_ = self._layout_offset
+        for axis in (0, 1):
+            size = top_rect[axis + 2]
+            if offset_[axis] == 0:
+                # All cards share this coordinate.
+                if not top_rect[axis] < pos[axis] < top_rect[axis] + size:
+                    return range(0)
+            else:
+                # Card i covers (pos + i * offset, pos + i * offset + size) on this axis.
+                rel = pos[axis] - self.pos[axis]
+                bounds = ((rel + 1) / offset_[axis], (rel - size - 1) / offset_[axis])
+                first = max(first, math.floor(min(bounds)))
+                last = min(last, math.ceil(max(bounds)))
+        return range(first, last + 1)
+
     def add_card(self, card_, on_top=True):
         """ Appends a card to the list of self.cards
         :param card_:  object of the Card class to be appended to the list
@@ -153,13 +249,8 @@ class CardsHolder(game_object.GameObject):
         """
         if isinstance(card_, card.Card):
             if on_top:
-                pos_ = self.pos
-                if len(self.cards) != 0:
-                    length = len(self.cards)
-                    pos_ = (self.pos[0] + length * self.offset[0],
-                            self.pos[1] + length * self.offset[1])
-                card_.set_pos(pos_)
                 self.cards.append(card_)
+                self.update_position_from(len(self.cards) - 1)
             else:
                 self.cards.insert(0, card_)
                 self.update_position()
@@ -175,8 +266,12 @@ class CardsHolder(game_object.GameObject):
             if len(self.cards) == 1 and self.last_card_callback is not None:
                 self.last_card_callback(self.cards[0])
 
+            if index < 0:
+                index += len(self.cards)
+            self.layout()  # The popped card leaves with its position.
             popped_card = self.cards.pop(index)
-            self.update_position()
+            # Only the cards above the popped one move down.
+            self.update_position_from(index)
             return popped_card
 
     def pop_top_card(self):
@@ -193,13 +288,49 @@ class CardsHolder(game_object.GameObject):
         """
         return self.pop_card(0)
 
+    def pop_bottom_cards(self, num_cards):
+        """ Removes the given number of cards from the bottom of the list at once.
+        :param num_cards: Number of cards to remove.
+        :return: List(Card), bottom card first
+        """
+        num_cards = min(num_cards, len(self.cards))
+        if num_cards <= 0:
+            return []
+        if num_cards == len(self.cards) and self.last_card_callback is not None:
+            self.last_card_callback(self.cards[-1])
+
+        self.layout()
+        popped_cards = self.cards[:num_cards]
+        del self.cards[:num_cards]
+        self.update_position()
+        return popped_cards
+
+    def add_cards(self, cards, on_top=True):
+        """ Appends a list of cards at once.
+        :param cards: list of Card objects, bottom card first
+        :param on_top: bolean, True if the cards should be put on top, False in the bottom
+        """
+        if not self.fixed_layout:
+            for card_ in (cards if on_top else reversed(cards)):
+                self.add_card(card_, on_top)
+        elif on_top:
+            start = len(self.cards)
+            self.cards.extend(cards)
+            self.update_position_from(start)
+        else:
+            self.cards[:0] = cards
+            self.update_position()
+
     def pop_all_cards(self):
         """ Pop all cards out of the holder.
         :return: List(Card)
         """
-        popped_cards = []
-        while len(self.cards) > 0:
-            popped_cards.insert(0, self.pop_top_card())
+        if len(self.cards) > 0 and self.last_card_callback is not None:
+            self.last_card_callback(self.cards[0])
+        self.layout()
+        popped_cards = self.cards[:]
+        self.cards.clear()
+        self._snapshot = None
         return popped_cards
 
     def flip_cards(self):
@@ -222,21 +353,45 @@ class CardsHolder(game_object.GameObject):
         :param back_side_up: True if cards should be flipped to back side up, False otherwise.
         """
         if isinstance(other, CardsHolder):
-            while len(self.cards) != 0:
-                card_ = self.pop_top_card()
-                if card_ is not None:
-                    if card_.back_up != back_side_up:
-                        card_.flip()
-                    other.add_card(card_)
+            # Cards are moved top card first, so they end up in reverse order.
+            cards = self.pop_all_cards()
+            cards.reverse()
+            for card_ in cards:
+                if card_.back_up != back_side_up:
+                    card_.flip()
+            other.add_cards(cards)
 
     def update_position(self):
-        """ Updates position of all cards according to the offset passed
+        """ Updates position of all cards according to the offset passed. Positions are
+        only marked out of date here and derived from the holder's position when the cards
+        are next drawn, hit-tested or popped (see layout()), so moving a holder, e.g. in every
+        frame of an animation, costs the same however many cards it holds.
         """
-        pos_ = self.pos
-        offset_ = self.offset
-        for card_ in self.cards:
-            card_.set_pos(pos_)
-            pos_ = pos_[0] + offset_[0], pos_[1] + offset_[1]
+        self.update_position_from(0)
+
+    def update_position_from(self, index):
+        """ Updates position of the cards from the given index to the top, e.g. when
+        the cards below them did not change. See update_position().
+        :param index: Index of the lowest card to update.
+        """
+        if self._stale_from is None or index < self._stale_from:
+            self._stale_from = index
+        self._snapshot = None
+
+    def layout(self):
+        """ Sets the position of the cards whose position is out of date. Called before
+        anything reads card positions; card_pos() gives a position without it.
+        All cards move when the number of cards changes the offset (see layout_offset()).
+        """
+        if self._stale_from is None:
+            return
+        offset_ = self.layout_offset()
+        if offset_ != self._layout_offset:
+            self._layout_offset = offset_
+            self._stale_from = 0
+        for i in range(self._stale_from, len(self.cards)):
+            self.cards[i].set_pos((self.pos[0] + i * offset_[0], self.pos[1] + i * offset_[1]))
+        self._stale_from = None
 
     def check_collide(self, card_):
         """ Checks if current cards holder collides with other card.
@@ -244,6 +399,7 @@ class CardsHolder(game_object.GameObject):
         :return: True if card collides with holder, False otherwise
         """
         if len(self.cards) > 0:
+            self.layout()
             if self.grab_policy == enums.GrabPolicy.can_single_grab:
                 # If can only grab top card, then only check for collision
                 # with top card.
@@ -254,6 +410,108 @@ class CardsHolder(game_object.GameObject):
         else:
             return card_.check_collide(pos=self.pos)
 
+    def render_snapshot(self):
+        """ Image and position of every card, bottom to top. Holders that draw something in
+        render() extend the snapshot with whatever that depends on.
+        The snapshot is kept, and returned as the same object, until the holder changes or a
+        card is turned over, so cards must be moved through the holder (see update_position()).
+        """
+        turn_count = card_sprite.AbstractPygameCardSprite.turn_count
+        if self._snapshot is None or self._snapshot[0] != turn_count:
+            self.layout()
+            if self.is_compact:
+                snapshot = (len(self.cards), self.cards[-1].sprite.get_render_tuple())
+            else:
+                snapshot = tuple(card_.sprite.get_render_tuple() for card_ in self.cards)
+            self._snapshot = (turn_count, snapshot)
+        return self._snapshot[1]
+
+    def get_bounds(self):
+        """ Rect covering all cards of the holder, or None if it is empty. """
+        if len(self.cards) == 0:
+            return None
+        self.layout()
+        if self.is_compact:
+            return pygame.Rect(self.cards[-1].sprite.rect)  # The badge is drawn inside the top card.
+        return pygame.Rect(self.cards[0].sprite.rect).unionall([card_.sprite.rect for card_ in self.cards])
+
+    def visible_cards(self):
+        """ Cards that are not completely hidden by a card above them. A card is hidden when the
+        nearest visible card above it covers it (see card_sprite.covers()), as in a pile with a
+        small or zero offset, where only the top cards can be seen.
+        :return: list of Card objects, bottom to top
+        """
+        self.layout()
+        visible = []
+        cover = None  # Render tuple of the nearest visible card above
+        for card_ in reversed(self.cards):
+            image, pos = card_.sprite.get_render_tuple()
+            if cover is not None and card_sprite.covers(cover[0], image, (pos[0] - cover[1][0],
+                                                                          pos[1] - cover[1][1])):
+                continue
+            visible.append(card_)
+            cover = (image, pos)
+        visible.reverse()
+        return visible
+
+    def render_all(self, screen):
+        """ Renders the visible cards (see visible_cards()) and the holder itself.
+        :param screen: Screen to render objects on
+        """
+        for image, pos in self.get_draw_list():
+            screen.blit(image, pos)
+        self.render(screen)
+
+    def get_draw_list(self):
+        """ Returns the images of the visible cards (see visible_cards()) as a list of
+        (surface, position), bottom to top. If cache_lower_cards is set, the cards below the top
+        one are drawn from a cached surface. Holders that draw something in render() must add it
+        here as well to show up in scene snapshots (see scene.Scene).
+        """
+        if self.is_compact:
+            self.layout()
+            return [self.cards[-1].sprite.get_render_tuple(), self.get_count_badge()]
+        cards = self.visible_cards()
+        draw_list = []
+        if self.cache_lower_cards and len(cards) > CardsHolder.lower_cards_cache_min:
+            draw_list.append(self.get_lower_cards_surface(cards[:-1]))
+            cards = cards[-1:]
+        draw_list.extend(card_.sprite.get_render_tuple() for card_ in cards)
+        return draw_list
+
+    def get_lower_cards_surface(self, cards):
+        """ Returns the given cards drawn onto one surface. The surface is kept and drawn again
+        only when the cards change, i.e. when cards are pushed to or popped from the holder.
+        :param cards: list of Card objects, bottom to top
+        :return: tuple (surface, position) to blit
+        """
+        key = tuple(card_.sprite.get_render_tuple() for card_ in cards)
+        if self._lower_cards_cache is None or self._lower_cards_cache[0] != key:
+            bounds = pygame.Rect(cards[0].sprite.rect).unionall([card_.sprite.rect for card_ in cards])
+            surface = pygame.Surface(bounds.size, pygame.SRCALPHA, 32)
+            for image, pos in key:
+                surface.blit(image, (pos[0] - bounds.x, pos[1] - bounds.y))
+            self._lower_cards_cache = (key, surface, bounds.topleft)
+        return self._lower_cards_cache[1], self._lower_cards_cache[2]
+
+    def get_count_badge(self):
+        """ Returns the badge of a compact holder, with the number of cards in a circle at the
+        top right corner of the top card. The surface is drawn again only when the number changes.
+        :return: tuple (surface, position) to blit
+        """
+        if self._count_badge is None or self._count_badge[0] != len(self.cards):
+            badge_json = self.count_badge_json
+            text = gui.get_font(badge_json["text_size"]).render(str(len(self.cards)), True,
+                                                                badge_json["text_color"])
+            diameter = max(text.get_size()) + 8
+            surface = pygame.Surface((diameter, diameter), pygame.SRCALPHA, 32)
+            pygame.draw.circle(surface, badge_json["background_color"], (diameter // 2, diameter // 2), diameter // 2)
+            surface.blit(text, ((diameter - text.get_width()) // 2, (diameter - text.get_height()) // 2))
+            self._count_badge = (len(self.cards), surface)
+        surface = self._count_badge[1]
+        top_rect = self.cards[-1].sprite.rect
+        return surface, (top_rect[0] + top_rect[2] - surface.get_width() - 4, top_rect[1] + 4)
+
     def render(self, screen):
         """ Does not render anything by default.
         Should be overridden in derived classes if need to render anything for the holder itself.
@@ -266,6 +524,8 @@ class CardsHolder(game_object.GameObject):
 class GrabbedCardsHolder(CardsHolder):
     """Specialized card holder, where the position always follows the mouse.
     """
+    fixed_layout = False  # Cards catch up with the mouse only when drawn.
+
     def __init__(self, mouse_offset=(0, 0), offset=(0, 0),
                  grab_policy=enums.GrabPolicy.no_grab,
                  last_card_callback=None):
@@ -279,12 +539,25 @@ class GrabbedCardsHolder(CardsHolder):
             last_card_callback)
 
     def render_all(self, screen):
-        # Track the mouse position.
-        self.pos = self.get_target_pos()
-        self.update_position()
-
+        self.follow_mouse()
         super().render_all(screen)
 
+    def render_snapshot(self):
+        # Follow the mouse before comparing frames, not only when drawing.
+        self.follow_mouse()
+        return super().render_snapshot()
+
+    def get_draw_list(self):
+        self.follow_mouse()
+        return super().get_draw_list()
+
+    def follow_mouse(self):
+        """Moves the holder to the mouse position, if the mouse moved."""
+        target_pos = self.get_target_pos()
+        if target_pos != tuple(self.pos):
+            self.pos = target_pos
+            self.update_position()
+
     def get_target_pos(self):
         """Get the current desired position of this holder, whose purpose
         is to track the position of the mouse.
@@ -299,6 +572,8 @@ class StaticOffsetCardsHolder(CardsHolder):
     """Specialized card holder, where each card keeps its position relative
     to the other cards.
     """
+    fixed_layout = False
+
     def __init__(self, pos=(0, 0), grab_policy=enums.GrabPolicy.no_grab,
                 last_card_callback=None):
         """
@@ -307,7 +582,7 @@ class StaticOffsetCardsHolder(CardsHolder):
         """
         CardsHolder.__init__(self, pos=pos, grab_policy=grab_policy,\
                             last_card_callback=last_card_callback)
-        self.last_pos = pos # This will be updated when update_position called.
+        self.last_pos = pos # This will be updated when the cards are laid out.
 
     def add_card(self, card_, on_top=True):
         """ Appends a card to the list of self.cards
@@ -315,19 +590,24 @@ class StaticOffsetCardsHolder(CardsHolder):
         :param on_top: bolean, True if the card should be put on top, False in the bottom
         """
         if isinstance(card_, card.Card):
+            self.layout()  # The new card must not follow earlier moves of the holder.
             if on_top:
                 self.cards.append(card_)
             else:
                 self.cards.insert(0, card_)
+            self._snapshot = None
 
-    def update_position(self):
-        """ Updates position of all cards according to their relative
-        position to each other.
+    def layout(self):
+        """ Moves all cards by how far the holder moved since the last layout, so they
+        keep their position relative to each other.
         """
+        if self._stale_from is None:
+            return
         offset_ = (self.pos[0] - self.last_pos[0], self.pos[1] - self.last_pos[1])
 
         for card_ in self.cards:
             card_pos = card_.get_pos()
             card_.set_pos((card_pos[0] + offset_[0], card_pos[1] + offset_[1]))
-        
+
         self.last_pos = self.pos
+        self._stale_from = None
@@ -4,6 +4,7 @@ try:
     import sys
     import os
     import math
+    import json
     import pygame
 
     from pygame_cards import enums
@@ -35,9 +36,170 @@ def get_img_full_path(path):
             raise IOError("File not found: " + path)
 
 
+# Process-wide cache of scaled images, keyed by (path, size). Card sprites share these
+# Surfaces, so each image file is decoded and scaled only once per size. The Surfaces must be
+# treated as read-only.
+_image_cache = {}
+
+# Texture atlas written by generate.py: sub-rects of the prescaled images per card size, and
+# the atlas image, decoded on first use.
+_atlas_json_path = None
+_atlas_index = None
+_atlas_image_path = None
+_atlas_image = None
+
+
+def load_atlas(atlas_json_path):
+    """ Takes images from the texture atlas described by atlas_json_path from now on, for the
+    paths and sizes it contains. Other images are still loaded from their own files.
+    :param atlas_json_path: path to the atlas JSON index, or None to stop using an atlas
+    :return: True if the atlas was found
+    """
+    global _atlas_json_path, _atlas_index, _atlas_image_path, _atlas_image
+    _atlas_json_path = atlas_json_path
+    _atlas_index = None
+    _atlas_image_path = None
+    _atlas_image = None
+    clear_image_cache()
+    if atlas_json_path is None:
+        return False
+    try:
+        full_path = get_img_full_path(atlas_json_path)
+    except IOError:
+        return False
+    with open(full_path, 'r') as json_file:
+        atlas_json = json.load(json_file)
+    _atlas_index = atlas_json["sprites"]
+    _atlas_image_path = os.path.join(os.path.dirname(full_path), atlas_json["image"])
+    return True
+
+
+def _atlas_subsurface(path, size):
+    """ Returns the atlas sub-surface for the image at path with the given size, or None. """
+    global _atlas_image
+    if _atlas_index is None:
+        return None
+    rect = _atlas_index.get(f'{size[0]}x{size[1]}', {}).get(path)
+    if rect is None:
+        return None
+    if _atlas_image is None:
+        _atlas_image = pygame.image.load(_atlas_image_path).convert_alpha()
+    return _atlas_image.subsurface(rect)
+
+
+def load_scaled_image(path, size):
+    """ Returns the image at path scaled to size, loading and scaling it on first use only.
+    Images contained in the texture atlas (see load_atlas()) are sub-surfaces of the atlas.
+    :param path: Relative or full path to the image.
+    :param size: tuple or list (width, height)
+    :return: shared pygame.Surface
+    """
+    key = (path, tuple(size))
+    image = _image_cache.get(key)
+    if image is None:
+        image = _atlas_subsurface(path, key[1])
+        if image is None:
+            image = pygame.transform.scale(pygame.image.load(get_img_full_path(path)).convert_alpha(), key[1])
+        _image_cache[key] = image
+    return image
+
+
+# Whether an image is fully opaque, per Surface (see is_opaque()).
+_opaque_cache = {}
+
+
+def is_opaque(image):
+    """ Checks if every pixel of an image is fully opaque, so that it hides whatever it is
+    drawn over. The result is cached per Surface, images are treated as read-only.
+    :param image: pygame.Surface
+    :return: True if the image is opaque
+    """
+    opaque = _opaque_cache.get(image)
+    if opaque is None:
+        if image.get_flags() & pygame.SRCALPHA:
+            opaque = pygame.mask.from_surface(image, 254).count() == image.get_width() * image.get_height()
+        else:
+            opaque = image.get_colorkey() is None and image.get_alpha() in (None, 255)
+        _opaque_cache[image] = opaque
+    return opaque
+
+
+# Masks of the pixels an image draws and of those it draws fully opaque, per Surface.
+_mask_cache = {}
+# Results of covers(), per (upper, lower, offset).
+_cover_cache = {}
+
+
+def _get_masks(image):
+    masks = _mask_cache.get(image)
+    if masks is None:
+        masks = (pygame.mask.from_surface(image, 0), pygame.mask.from_surface(image, 254))
+        _mask_cache[image] = masks
+    return masks
+
+
+def covers(upper, lower, offset):
+    """ Checks if an image hides another one drawn before it, i.e. if the upper image is at least
+    as opaque as the lower one wherever the lower one draws something. Card images share the
+    shape of their rounded corners, so a card hides the cards below it at the same place; only
+    the few half transparent pixels at their corners would get a bit darker by drawing them.
+    The result is cached, images are treated as read-only.
+    :param upper: pygame.Surface drawn on top
+    :param lower: pygame.Surface drawn before
+    :param offset: position of the lower image relative to the upper one
+    :return: True if the lower image can be left out
+    """
+    dx, dy = offset
+    if dx < 0 or dy < 0 or dx + lower.get_width() > upper.get_width() or \
+            dy + lower.get_height() > upper.get_height():
+        return False
+    if is_opaque(upper):
+        return True
+    if not upper.get_flags() & lower.get_flags() & pygame.SRCALPHA:
+        return False
+    key = (upper, lower, offset)
+    covered = _cover_cache.get(key)
+    if covered is None:
+        # Pixels of the lower image not hidden by opaque pixels of the upper one
+        uncovered = _get_masks(lower)[0].copy()
+        uncovered.erase(_get_masks(upper)[1], (-dx, -dy))
+        covered = all(lower.get_at((x, y)).a <= upper.get_at((x + dx, y + dy)).a
+                      for rect in uncovered.get_bounding_rects()
+                      for x in range(rect.left, rect.right)
+                      for y in range(rect.top, rect.bottom)
+                      if uncovered.get_at((x, y)))
+        _cover_cache[key] = covered
+    return covered
+
+
+def clear_image_cache():
+    """ Drops all cached images, e.g. after the card size has changed. """
+    _image_cache.clear()
+    _opaque_cache.clear()
+    _mask_cache.clear()
+    _cover_cache.clear()
+
+
+def set_card_json(card_json):
+    """ Sets the 'card' node of the settings used by CardSprite. Cached images are dropped if
+    the card size changes. The texture atlas given by "atlas_file", if any, is loaded.
+    :param card_json: The 'card' node of the settings.json
+    """
+    old_json = CardSprite.card_json
+    if old_json is not None and list(old_json["size"]) != list(card_json["size"]):
+        clear_image_cache()
+    if card_json.get("atlas_file") != _atlas_json_path:
+        load_atlas(card_json.get("atlas_file"))
+    CardSprite.card_json = card_json
+
+
 class AbstractPygameCardSprite(pygame.sprite.Sprite):
     """ Abstract base class for Card sprite with pygame routines implemented in default methods. """
 
+    # Number of times a card was turned over, by any sprite. Cards holders keep their render
+    # snapshot until it changes (see CardsHolder.render_snapshot()).
+    turn_count = 0
+
     def __init__(self, pos):
         self.rect = [pos[0], pos[1], 0, 0]
         self.mouse_offset = [0, 0]
@@ -66,8 +228,11 @@ class AbstractPygameCardSprite(pygame.sprite.Sprite):
         return self.image, (self.rect[0], self.rect[1])
 
     def is_clicked(self, pos):
-        return (pos[0] > self.rect[0] and pos[0] < (self.rect[0] + self.get_rect()[2]) and
-                pos[1] > self.rect[1] and pos[1] < (self.rect[1] + self.get_rect()[3]))
+        x, y, width, height = self.rect
+        if width == 0 and height == 0:
+            # Size not taken over from the image by the derived class.
+            width, height = self.get_rect().size
+        return x < pos[0] < x + width and y < pos[1] < y + height
 
     def check_card_collide(self, sprite):
         rect = pygame.Rect(self.rect)
@@ -94,16 +259,13 @@ class CardSprite(AbstractPygameCardSprite):
             raise ValueError('CardSprite.card_json is not initialized')
         AbstractPygameCardSprite.__init__(self, pos)
 
-        temp_image = pygame.image.load(get_img_full_path(
-            self.get_image_path(suit, rank))).convert_alpha()
-        self.image = pygame.transform.scale(temp_image, CardSprite.card_json["size"])
+        size = CardSprite.card_json["size"]
+        self.image = load_scaled_image(self.get_image_path(suit, rank), size)
         self.rect = self.image.get_rect()
         self.rect[0] = pos[0]
         self.rect[1] = pos[1]
 
-        back_img_path = CardSprite.card_json["back_sprite_file"]
-        temp_image = pygame.image.load(get_img_full_path(back_img_path)).convert_alpha()
-        self.back_image = pygame.transform.scale(temp_image, CardSprite.card_json["size"])
+        self.back_image = load_scaled_image(CardSprite.card_json["back_sprite_file"], size)
         self.back_up = back_up
 
     def get_render_tuple(self):
@@ -119,6 +281,7 @@ class CardSprite(AbstractPygameCardSprite):
     @back_up.setter
     def back_up(self, value):
         self._back_up = value
+        AbstractPygameCardSprite.turn_count += 1
 
     @staticmethod
     def get_image_path(suit, rank):
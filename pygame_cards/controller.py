@@ -2,8 +2,9 @@
 try:
     import sys
     import abc
+    import threading
 
-    from pygame_cards import game_object, card, card_sprite, card_holder, animation
+    from pygame_cards import game_object, card, card_sprite, card_holder, animation, scheduler
 except ImportError as err:
     print("Fail loading a module in file:", __file__, "\n", err)
     sys.exit(2)
@@ -34,6 +35,7 @@ class Controller(object, metaclass=abc.ABCMeta):
         """
         self.rendered_objects = []
         self.animations = []
+        self.removed_rects = []  # Screen areas of removed objects, to be redrawn
         if objects_list is not None and isinstance(objects_list, list):
             self.rendered_objects = objects_list
         self.gui_interface = gui_interface
@@ -41,6 +43,14 @@ class Controller(object, metaclass=abc.ABCMeta):
         self.started = False
         # Make this a color tuple to override game app's background_color.
         self.background_color = None
+        # Held by GameApp while it runs a frame. The game objects are only changed on the game
+        # loop, scheduled calls included; code on other threads must hold it to read them.
+        self.lock = threading.RLock()
+        # Delayed callbacks, run by GameApp at frame boundaries, e.g. an AI player's move.
+        self.scheduler = scheduler.Scheduler()
+        # Turbo mode: card moves land instantly and GameApp runs the game logic as fast as it
+        # can, drawing frames at a fixed low rate (window.turbo_fps).
+        self.turbo = False
 
     @abc.abstractmethod
     def start_game(self):
@@ -74,6 +84,16 @@ class Controller(object, metaclass=abc.ABCMeta):
         """
         pass
 
+    def is_idle(self):
+        """ Checks if the game is only waiting for user input. GameApp then stops rendering
+        frames and blocks until an event arrives.
+        By default the game is idle when no animation runs. Callbacks waiting in
+        self.scheduler still run on time. Controllers that have other work to do in
+        execute_game() should override this method.
+        :return: True if idle
+        """
+        return len(self.animations) == 0
+
     def restart_game(self):
         """ Put code that cleans up any current game progress and starts the game from scratch.
             start_game() method can be called here to avoid code duplication.
@@ -88,6 +108,13 @@ class Controller(object, metaclass=abc.ABCMeta):
         pass
 
     def render_objects(self, screen):
+        """ Renders game objects and advances the animations.
+        :param screen: Screen to render objects on.
+        """
+        self.draw_objects(screen)
+        self.update_animations()
+
+    def draw_objects(self, screen):
         """ Renders game objects.
         :param screen: Screen to render objects on.
         """
@@ -95,14 +122,32 @@ class Controller(object, metaclass=abc.ABCMeta):
             for obj in self.rendered_objects:
                 if isinstance(obj, game_object.GameObject):
                     obj.render_all(screen)
-        
-        # Advance all animations.
+
+    def update_animations(self):
+        """ Advances all animations and drops the completed ones. """
         for animation in self.animations:
             animation.update()
 
         # Clear completed animations.
         self.animations = [a for a in self.animations if not a.is_completed]
 
+    def get_dirty_rects(self):
+        """ Returns the screen areas changed by game objects since the previous call.
+        :return: list of rects, or None if the whole screen has to be redrawn
+        """
+        rects = self.removed_rects
+        self.removed_rects = []
+        full_redraw = False
+        if self.rendered_objects is not None:
+            for obj in self.rendered_objects:
+                if isinstance(obj, game_object.GameObject):
+                    obj_rects = obj.get_dirty_rects()
+                    if obj_rects is None:
+                        full_redraw = True  # Keep going, other objects still take their snapshots.
+                    else:
+                        rects.extend(obj_rects)
+        return None if full_redraw else rects
+
     def add_rendered_object(self, obj):
         """ Adds object to the list of objects to be rendered by the Controller.
         :param obj: an instance of GameObject or derived class.
@@ -119,6 +164,9 @@ class Controller(object, metaclass=abc.ABCMeta):
         :param obj: Rendered object to remove.
         """
         self.rendered_objects.remove(obj)
+        bounds = obj.forget_rendered()
+        if bounds is not None:
+            self.removed_rects.append(bounds)
 
     def add_animation(self, animation):
         """Adds an animation to the list of active animations in the controller.
@@ -145,37 +193,83 @@ class Controller(object, metaclass=abc.ABCMeta):
             animation is over; returns original holder passed in, or, if a
             list of cards was passed, a new holder containing those cards.
         """
-        self_ = self
+        if not isinstance(cards, card_holder.CardsHolder) and len(cards) == 0: return
 
-        holder = cards
-        temp_holder_required = not isinstance(cards, card_holder.CardsHolder)
-        if temp_holder_required:
-            if len(cards) == 0: return
-            holder = card_holder.StaticOffsetCardsHolder(pos=cards[0].get_pos())
-            for card_ in cards:
-                holder.add_card(card_)
-            self.add_rendered_object(holder)
+        def callback(holders):
+            if on_complete: on_complete(holders[0])
 
-        def callback():
-            if on_complete: on_complete(holder)
-            if temp_holder_required: self_.remove_rendered_object(holder)
+        self.animate_card_moves([(cards, end_pos)], speed, 0, plotter_fn, callback)
 
+    def animate_card_moves(self, moves, speed=None, stagger_ms=None, plotter_fn=None,
+                           on_complete=None):
+        """Run several card flights at once, e.g. a deal to all players. Flight i
+        starts i * stagger_ms after the first one, so flights overlap, and
+        on_complete is called once, after the last flight has landed.
+        :param moves: List of (cards, end_pos) tuples, where cards is either a
+            list of Cards or a CardsHolder and end_pos is the position (x,y)
+            where they should end up. See animate_cards().
+        :param speed: Speed in pixels / second. If not given, uses
+            card.move_speed from settings.json.
+        :param stagger_ms: Delay in milliseconds between the starts of two
+            consecutive flights. If not given, uses card.stagger_ms from
+            settings.json, or 0 if it's not there.
+            In turbo mode, all flights land right away.
+        :param plotter_fn: (Optional) lambda(start_pos, end_pos, duration_ms)
+            that returns a Plotter object, used for every flight. See animate_cards().
+        :param on_complete: (Optional) lambda(holders) called when all flights
+            are over, with one CardsHolder per move, in the order of moves. Like
+            in animate_cards(), lists of cards are put into new holders, which
+            are removed after the callback.
+        """
         if speed is None:
             speed = self.settings_json["card"]["move_speed"]
-        start_pos = holder.pos
-        duration_ms = animation.expected_duration_ms(start_pos, end_pos, speed)
-
-        if duration_ms > 0:
-            # Derive plotter.
-            plotter = None
-            if plotter_fn is None:
-                plotter = animation.LinearPlotter(start_pos, end_pos, duration_ms)
+        if stagger_ms is None:
+            stagger_ms = self.settings_json["card"].get("stagger_ms", 0)
+
+        holders = []
+        temp_holders = []
+        for cards, end_pos in moves:
+            holder = cards
+            if not isinstance(cards, card_holder.CardsHolder):
+                # An empty list has nothing to fly, it lands right away.
+                holder = card_holder.StaticOffsetCardsHolder(pos=cards[0].get_pos() if cards else end_pos)
+                for card_ in cards:
+                    holder.add_card(card_)
+                self.add_rendered_object(holder)
+                temp_holders.append(holder)
+            holders.append(holder)
+
+        flights_left = [len(moves)]
+
+        def on_landed():
+            flights_left[0] -= 1
+            if flights_left[0] > 0: return
+            if on_complete: on_complete(holders)
+            for holder_ in temp_holders:
+                self.remove_rendered_object(holder_)
+
+        if len(moves) == 0:
+            flights_left[0] = 1
+            on_landed()
+        for i, (holder, (cards, end_pos)) in enumerate(zip(holders, moves)):
+            start_pos = holder.pos
+            duration_ms = animation.expected_duration_ms(start_pos, end_pos, speed)
+
+            if self.turbo:
+                holder.pos = end_pos
+                holder.update_position()
+                on_landed()
+            elif duration_ms > 0:
+                # Derive plotter.
+                plotter = None
+                if plotter_fn is None:
+                    plotter = animation.LinearPlotter(start_pos, end_pos, duration_ms)
+                else:
+                    plotter = plotter_fn(start_pos, end_pos, duration_ms)
+
+                animation_ = animation.CardsHolderAnimation(holder, plotter, on_landed, i * stagger_ms)
+                self.add_animation(animation_)
             else:
-                plotter = plotter_fn(start_pos, end_pos, duration_ms)
-            
-            animation_ = animation.CardsHolderAnimation(holder, plotter, callback)
-            self.add_animation(animation_)
-        else:
-            # Short-circuit; don't create animation for 0 ms; just invoke
-            # the callback immediately.
-            callback()
+                # Short-circuit; don't create animation for 0 ms; the flight
+                # has landed already.
+                on_landed()
@@ -4,6 +4,7 @@ try:
     from random import shuffle
 
     from pygame_cards import enums, card, card_holder
+    import qcards
 except ImportError as err:
     print("Fail loading a module in file:", __file__, "\n", err)
     sys.exit(2)
@@ -32,58 +33,10 @@ class Deck(card_holder.CardsHolder):
         #         self.cards.append(card.Card(suit, rank, card_pos, True))
         #         card_pos = card_pos[0] + self.offset[0], card_pos[1] + self.offset[1]
 
-        qno_deck = self.buildDeck()
-        for c in qno_deck:
-            state = c[0]
-            value = c[1]
-            self.cards.append(card.Card(state, value, card_pos, True))
+        for card_id, (state, value) in enumerate(qcards.DECK):
+            self.cards.append(card.Card(state, value, card_pos, True, card_id))
             card_pos = card_pos[0] + self.offset[0], card_pos[1] + self.offset[1]
 
-    def buildDeck(self):
-        deck = []
-        states = ["|00>", "|01>", "|10>", "|11>"]
-        values = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, "Draw Two", "Skip", "Reverse"]
-        gateState = ["Gate"]
-        gateVal = ["H", "X", "CNOT"]
-
-        # tiny deck
-        # values = [1, 2, 3, 4]
-        # values = [0]
-        # gateVal = ["H"]*10
-        # gateVal = ["X", "CNOT"]
-        Ncopies = 1
-
-        for state in states:
-            for i in range(Ncopies):
-                for value in values:
-                    cardVal = [state, value]
-                    deck.append(cardVal)
-                    if value != 0:
-                        deck.append(cardVal)
-
-        ##### add gates
-        for i in range(4):
-            for gate in gateState:
-                for gatevalue in gateVal:
-                    cardVal = [gate, gatevalue]
-                    deck.append(cardVal)
-
-        # # add extra testing cards
-        # for state in states:
-        #     for i in range(50):
-        #         deck.append([state, "Reverse"])
-        # for state in states:
-        #     for i in range(50):
-        #         deck.append([state, "Draw Two"])
-
-        print('======')
-        print('N cards: ', len(deck))
-        print('======')
-        # for i in deck:
-        #     print(i)
-        # print('======')
-        return (deck)
-
     def shuffle(self):
         """ Shuffles cards in the deck randomly """
         shuffle(self.cards)
@@ -1,36 +1,49 @@
 #!/usr/bin/env python
 try:
     import sys
+    import math
+    import time
     import pygame
     import threading
+    import collections
     import json
     import abc
     import logging
 
     from . import gui
 
-    from pygame_cards import controller, card_holder, card_sprite
+    from pygame_cards import controller, card_holder, card_sprite, game_object, scene, scheduler
 except ImportError as err:
     print("Fail loading a module in file:", __file__, "\n", err)
     sys.exit(2)
 
 
 class RenderThread(threading.Thread):
-    """ Represents thread for rendering of game objects """
+    """ Represents thread for rendering of game objects. It draws the scene snapshots
+    (see scene.Scene) published by the game loop, always the latest one, and never touches the
+    game objects themselves.
+    """
 
-    def __init__(self, app):
+    def __init__(self, app, max_fps=300):
         """
         :param app: object of GameApp class which sprites will be rendered
+        :param max_fps: upper limit of frames drawn per second
         """
-        threading.Thread.__init__(self)
+        threading.Thread.__init__(self, daemon=True)
         self.app = app
+        self.max_fps = max_fps
+        self.renderer = scene.SceneRenderer(app.screen)
 
     def run(self):
-        """ Starts endless loop and renders game objects in it """
+        """ Starts endless loop and renders the published scenes in it """
+        clock = pygame.time.Clock()
+        version = 0
         while not self.app.stopped:
-            self.app.clock.tick(300)
-            self.app.render()
-            pygame.display.flip()
+            scene_, version = self.app.scene_buffer.take(version)
+            if scene_ is None:
+                continue
+            self.app.update_display(self.renderer.draw(scene_))
+            clock.tick(self.max_fps)
 
 
 class JsonHelper:
@@ -127,14 +140,51 @@ class GameApp(object, metaclass=abc.ABCMeta):
     """ GameApp class controls the application flow and settings. """
 
     class GuiInterface(object):
-        """ Inner class with GUI interface functions """
+        """ Inner class with GUI interface functions.
+
+        Elements are kept in an ordered draw list and, if they have an ID, in an index by ID.
+        Labels time out through self.scheduler, which GameApp runs together with the scheduler
+        of the game controller; they are queued and removed by the next get_dirty_rects() call,
+        never while the elements are being iterated.
+        """
         def __init__(self, screen):
             self.screen = screen
-            self.gui_list = []
+            self.elements = {}  # Draw list: element -> None, in insertion order
+            self.elements_by_id = {}
+            self.expired = collections.deque()  # Labels that timed out
+            self.removed_rects = []  # Screen areas of removed elements, to be redrawn
+            # Runs label timeouts. It is not the game controller's scheduler, so a game can
+            # cancel all of its own calls without cancelling them.
+            self.scheduler = scheduler.Scheduler()
+
+        @property
+        def gui_list(self):
+            """ List of current GUI elements, in draw order. """
+            return list(self.elements)
+
+        def add(self, element):
+            """ Adds an element on top of the others. An element with the same ID is replaced.
+            :param element: object of gui.AbstractGUI
+            """
+            if element.id_:
+                self.hide_by_id(element.id_)
+                self.elements_by_id[element.id_] = element
+            self.elements[element] = None
+            if hasattr(element, 'expired'):
+                element.on_expire = self.on_expire
+                if element.expired:  # Timed out before on_expire was set.
+                    self.expired.append(element)
+
+        def on_expire(self, element):
+            """ Queues a timed out element for removal by the next sweep_expired(). Called by
+            the element's timeout from Scheduler.run_due() on the game loop thread.
+            :param element: object of gui.AbstractGUI
+            """
+            self.expired.append(element)
 
         def show_label(self, position, text, text_size=15, color="black", timeout=3, id_=""):
-            """ Creates text label on the screen. The label is stored in the internal gui_list
-            list and gets rendered automatically.
+            """ Creates text label on the screen. The label is stored in the internal draw list
+            and gets rendered automatically.
             :param position: tuple with coordinates (x,y) of top left corner of the label
             :param text: string with text for the label
             :param text_size: integer text size
@@ -144,13 +194,13 @@ class GameApp(object, metaclass=abc.ABCMeta):
             :param id_: string ID of the label, should be unique for each GUI element
             :return: object of gui.Label
             """
-            label = gui.Label(self.screen, position, text, text_size, color, timeout, id_)
-            self.gui_list.append(label)
+            label = gui.Label(self.screen, position, text, text_size, color, timeout, id_, self.scheduler)
+            self.add(label)
             return label
 
         def show_button(self, rectangle, callback, text, text_size=15, color=(0, 0, 0), id_=""):
-            """ Creates text button on the screen. The button is stored in the internal gui_list
-            list and gets rendered automatically.
+            """ Creates text button on the screen. The button is stored in the internal draw list
+            and gets rendered automatically.
             :param rectangle: list with rectangle properties [x, y, width, height]
             :param callback: function that will be called when the button is clicked
             :param text: string with text for the button
@@ -160,45 +210,78 @@ class GameApp(object, metaclass=abc.ABCMeta):
             :return: object of gui.Button
             """
             button = gui.Button(self.screen, rectangle, callback, text, text_size, color, id_)
-            self.gui_list.append(button)
+            self.add(button)
             return button
 
         def hide_by_id(self, id_):
             """ Hides and destroys an object of gui.AbstractGUI (Button, Label etc.)
             :param id_: string with unique ID of GUI element
             """
-            for element in self.gui_list:
-                if hasattr(element, "id_") and element.id_ == id_:
-                    self.gui_list.remove(element)
-                    break
+            element = self.elements_by_id.get(id_)
+            if element is not None:
+                self.remove(element)
+
+        def remove(self, element):
+            """ Removes an element and marks its screen area for redrawing. Does nothing if the
+            element was already removed.
+            :param element: object of gui.AbstractGUI
+            """
+            if element not in self.elements:
+                return
+            del self.elements[element]
+            if getattr(element, 'timer', None) is not None:
+                element.timer.cancel()
+            if element.id_ and self.elements_by_id.get(element.id_) is element:
+                del self.elements_by_id[element.id_]
+            if element.rendered_rect is not None:
+                self.removed_rects.append(element.rendered_rect)
 
         def has_id(self, id_):
             ''' Check if there is an element named *id_*.
             :param id_: string with unique ID of GUI element
             '''
-            for element in self.gui_list:
-                if hasattr(element, "id_") and element.id_ == id_:
-                    return True
-            return False
+            return id_ in self.elements_by_id
 
         def render(self):
-            """ Renders all current GUI elements in the gui_list. """
-            for element in self.gui_list:
+            """ Renders all current GUI elements in the draw list. Expired elements are skipped,
+            they are removed by get_dirty_rects().
+            """
+            for element in tuple(self.elements):
                 if hasattr(element, 'expired') and element.expired:
-                    self.gui_list.remove(element)
                     continue
                 element.render()
 
+        def sweep_expired(self):
+            """ Removes the elements that timed out since the previous call. """
+            while self.expired:
+                self.remove(self.expired.popleft())
+
+        def get_dirty_rects(self):
+            """ Removes expired elements and returns the screen areas changed by GUI elements
+            since the previous call.
+            :return: list of rects
+            """
+            self.sweep_expired()
+            rects = self.removed_rects
+            self.removed_rects = []
+            for element in tuple(self.elements):
+                rects.extend(element.get_dirty_rects())
+            return rects
+
         def check_mouse(self, down):
-            """ Process mouse event for all GUI elements in the gui_list.
+            """ Process mouse event for all GUI elements in the draw list. Elements removed by
+            a click handler do not receive the event anymore.
             :param down: boolean, True if mouse down event, False otherwise.
             """
-            for element in self.gui_list:
-                element.check_mouse(pygame.mouse.get_pos(), down)
+            pos = pygame.mouse.get_pos()
+            for element in tuple(self.elements):
+                if element in self.elements:
+                    element.check_mouse(pos, down)
 
         def clean(self):
-            """ Destroys all elements in the gui_list. """
-            self.gui_list = []
+            """ Destroys all GUI elements. """
+            for element in tuple(self.elements):
+                self.remove(element)
 
     def __init__(self, json_path, controller_cls=None, **kwargs):
         """
@@ -221,7 +304,16 @@ class GameApp(object, metaclass=abc.ABCMeta):
         self.screen = pygame.display.set_mode(self.size)
         self.screen.fill(self.background_color)
         self.clock = pygame.time.Clock()
-        self.render_thread = RenderThread(self)
+        # Dirty-rectangle rendering: only changed areas are redrawn and sent to the display,
+        # see render().
+        self.full_redraw = True
+        self.rendered_background_color = None
+        # Idle mode: while the game only waits for input, block on events instead of rendering
+        # frames, but still run the game logic at least this often.
+        self.idle_timeout_ms = self.settings_json["window"].get("idle_timeout_ms", 1000)
+        # Frame rate while the game controller is in turbo mode.
+        self.turbo_fps = self.settings_json["window"].get("turbo_fps", 10)
+        self.frame_skipped = False  # The screen is behind the game, see run_game_loop()
         self.stopped = False
         self.mouse_timestamp = None  # Used for double click calculation
         self.gui_interface = GameApp.GuiInterface(self.screen)
@@ -234,6 +326,17 @@ class GameApp(object, metaclass=abc.ABCMeta):
             self.game_controller = controller_cls(**controller_kwargs)
         else:
             self.game_controller = None
+        # Held while a frame runs, see Controller.lock.
+        self.lock = self.game_controller.lock if self.game_controller is not None else threading.RLock()
+        # Delayed callbacks of the game, run at frame boundaries by execute_game_logic() like
+        # the label timeouts of self.gui_interface.scheduler.
+        self.scheduler = self.game_controller.scheduler if self.game_controller is not None\
+            else scheduler.Scheduler()
+        # Optional threaded rendering: the game loop publishes scene snapshots, the render
+        # thread draws them.
+        self.threaded_rendering = self.settings_json["window"].get("render_thread", False)
+        self.scene_buffer = scene.SceneBuffer()
+        self.render_thread = RenderThread(self)
 
     def is_double_click(self):
         if self.mouse_timestamp is None:
@@ -248,18 +351,65 @@ class GameApp(object, metaclass=abc.ABCMeta):
         return False
 
     def process_events(self):
-        """ Processes mouse events and quit event """
+        """ Processes all pending events """
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.stopped = True
-                # self.render_thread.join()
-                self.game_controller.cleanup()
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.MOUSEBUTTONUP:
-                self.process_mouse_event(False, self.is_double_click())
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                self.process_mouse_event(True)
+            self.process_event(event)
+
+    def process_event(self, event):
+        """ Processes mouse events, quit event and window expose events
+        :param event: pygame.event.Event
+        """
+        if event.type == pygame.QUIT:
+            self.stopped = True
+            self.scene_buffer.close()
+            if self.render_thread.is_alive():
+                self.render_thread.join()
+            self.game_controller.cleanup()
+            pygame.quit()
+            sys.exit()
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.process_mouse_event(False, self.is_double_click())
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            self.process_mouse_event(True)
+        elif event.type in (pygame.VIDEOEXPOSE, getattr(pygame, 'WINDOWEXPOSED', pygame.VIDEOEXPOSE)):
+            self.invalidate()
+
+    def is_idle(self):
+        """ Checks if nothing changes on screen until an event arrives: the game controller is
+        idle (see Controller.is_idle()) and the screen is up to date.
+        :return: True if idle
+        """
+        if self.full_redraw or self.frame_skipped:
+            return False
+        if self.gui_interface is not None and self.gui_interface.expired:
+            return False
+        if self.time_until_next_call_ms() == 0:
+            return False
+        return self.game_controller is None or self.game_controller.is_idle()
+
+    def time_until_next_call_ms(self):
+        """ Milliseconds until the next call of the game or GUI scheduler is due, 0 if one is
+        due already, or None if no call is pending. See Scheduler.time_until_next_ms().
+        """
+        times = [t for t in (self.scheduler.time_until_next_ms(),
+                             self.gui_interface.scheduler.time_until_next_ms()) if t is not None]
+        return min(times) if times else None
+
+    def wait_for_event(self, timeout_ms=None):
+        """ Blocks until an event arrives, a scheduled callback is due or the timeout has passed.
+        :param timeout_ms: longest wait in milliseconds (default: idle_timeout_ms)
+        :return: pygame.event.Event, or None on timeout
+        """
+        if timeout_ms is None:
+            timeout_ms = self.idle_timeout_ms
+        next_call_ms = self.time_until_next_call_ms()
+        if next_call_ms is not None:
+            # Round up so the call is due on return; pygame waits forever on 0.
+            timeout_ms = max(1, min(timeout_ms, int(next_call_ms) + 1))
+        event = pygame.event.wait(timeout_ms)
+        if event.type == pygame.NOEVENT:
+            return None
+        return event
 
     def load_settings_from_json(self):
         """ Parses configuration json file and sets properties with values from the json.
@@ -276,7 +426,7 @@ class GameApp(object, metaclass=abc.ABCMeta):
 
         # Init class members from other modules to avoid having a global varialbe for settings_json
         card_holder.CardsHolder.card_json = self.settings_json["card"]
-        card_sprite.CardSprite.card_json = self.settings_json["card"]
+        card_sprite.set_card_json(self.settings_json["card"])
 
     def process_mouse_event(self, down, double_click=False):
         """ Processes mouse events, invokes mouse events handlers in game_controller
@@ -294,28 +444,123 @@ class GameApp(object, metaclass=abc.ABCMeta):
         #self.init_gui()
         self.game_controller.start_game()
 
+    def invalidate(self):
+        """ Makes the next render() redraw the whole screen. """
+        self.full_redraw = True
+        self.render_thread.renderer.full_redraw = True
+
+    def get_background_color(self):
+        """ Returns the current background color, which the game controller may override. """
+        if self.game_controller is not None:
+            if getattr(self.game_controller, 'background_color', None) is not None:
+                return self.game_controller.background_color
+        return self.background_color
+
+    def build_scene(self):
+        """ Returns an immutable snapshot of what is on screen, for the render thread.
+        Game objects that do not implement get_draw_list() are left out.
+        :return: scene.Scene object
+        """
+        layers = []
+        if self.game_controller is not None and self.game_controller.rendered_objects is not None:
+            for obj in self.game_controller.rendered_objects:
+                if isinstance(obj, game_object.GameObject):
+                    draw_list = obj.get_draw_list()
+                    if draw_list is not None:
+                        layers.append(scene.Layer(id(obj), tuple(draw_list)))
+        if self.gui_interface is not None:
+            self.gui_interface.sweep_expired()
+            for element in self.gui_interface.gui_list:
+                layers.append(scene.Layer(id(element), tuple(element.get_draw_list())))
+        return scene.Scene(tuple(self.get_background_color()), tuple(layers))
+
+    def publish_scene(self):
+        """ Advances animations and hands a snapshot of the screen to the render thread. """
+        if self.game_controller is not None:
+            self.game_controller.update_animations()
+        self.scene_buffer.publish(self.build_scene())
+        # invalidate() passed a full redraw on to the renderer, which also finds the changed
+        # areas itself: drop what render() would have used, so that is_idle() can turn true.
+        self.full_redraw = False
+        if self.game_controller is not None:
+            self.game_controller.removed_rects = []
+        if self.gui_interface is not None:
+            self.gui_interface.removed_rects = []
+
     def render(self):
-        """ Renders game objects and gui elements """
+        """ Advances animations and redraws the areas of the screen that changed since the
+        previous frame: game objects and GUI elements report where they were and are drawn.
+        The whole screen is redrawn when the background color changes (e.g. while it pulses),
+        after invalidate() or when the changes cover most of the screen.
+        :return: list of redrawn rects to pass to update_display(), empty if nothing changed
+        """
         # Allow game controller to override background color.
-        background_color = self.background_color
+        background_color = self.get_background_color()
+
         if self.game_controller is not None:
-            if hasattr(self.game_controller, 'background_color'):
-                if self.game_controller.background_color is not None:
-                    background_color = self.game_controller.background_color
+            self.game_controller.update_animations()
 
+        # Collect the changed areas. Every object takes its snapshot, even if all is redrawn.
+        full_redraw = self.full_redraw or background_color != self.rendered_background_color
+        dirty_rects = []
+        if self.game_controller is not None:
+            rects = self.game_controller.get_dirty_rects()
+            if rects is None:
+                full_redraw = True
+            else:
+                dirty_rects.extend(rects)
+        if self.gui_interface is not None:
+            dirty_rects.extend(self.gui_interface.get_dirty_rects())
+
+        screen_rect = self.screen.get_rect()
+        if not full_redraw:
+            dirty_rects = scene.merge_rects(dirty_rects, screen_rect)
+            if sum(r.w * r.h for r in dirty_rects) > screen_rect.w * screen_rect.h // 2:
+                full_redraw = True
+        if full_redraw:
+            dirty_rects = [screen_rect]
+        self.full_redraw = False
+        self.rendered_background_color = background_color
+
+        for rect in dirty_rects:
+            self.screen.set_clip(rect)
+            self.draw(background_color)
+        self.screen.set_clip(None)
+        return dirty_rects
+
+    def draw(self, background_color):
+        """ Draws the background, game objects and GUI elements, limited to the clip area of
+        the screen.
+        :param background_color: tuple (R, G, B) with the current background color
+        """
         # Draw background
-        pygame.draw.rect(self.screen, background_color, (0, 0, self.size[0], self.size[1]))
+        self.screen.fill(background_color)
 
         # Render game controller elements.
         if self.game_controller is not None:
-            self.game_controller.render_objects(self.screen)
+            self.game_controller.draw_objects(self.screen)
 
         # Render GUI elements.
         if self.gui_interface is not None:
             self.gui_interface.render()
 
+    @staticmethod
+    def update_display(rects):
+        """ Sends the redrawn areas of the screen to the display.
+        :param rects: list of rects returned by render()
+        """
+        if rects:
+            pygame.display.update(rects)
+
+    def is_turbo(self):
+        """ Checks if the game controller is in turbo mode, see Controller.turbo. """
+        return self.game_controller is not None and self.game_controller.turbo
+
     def execute_game_logic(self):
-        """ Executes game logic. Should be called recurrently from the game loop """
+        """ Runs the scheduled callbacks that are due and executes game logic. Should be called
+        recurrently from the game loop """
+        self.scheduler.run_due()
+        self.gui_interface.scheduler.run_due()
         if self.game_controller is not None:
             self.game_controller.execute_game()
 
@@ -324,18 +569,58 @@ class GameApp(object, metaclass=abc.ABCMeta):
         self.render_thread.start()
 
     def run_game_loop(self):
-        """ Runs endless loop where game logic and events processing are executed. """
+        """ Runs endless loop where game logic and events processing are executed. Each frame
+        runs while holding self.lock. While the game is idle (see is_idle()), the loop blocks on
+        events instead of rendering frames.
+        With threaded rendering, the loop publishes a scene snapshot per frame instead of
+        drawing, so slow game logic does not hold up drawing and drawing never sees game
+        objects in the middle of a change.
+        In turbo mode (see is_turbo()), the loop does not wait between frames and draws only
+        turbo_fps frames per second, and the last frame before it idles. Between two of these
+        frames it runs the game logic as long as scheduled calls are due, and otherwise waits
+        for the next call, the next frame or an event.
+        """
+        next_turbo_frame = 0
+        event = None
         while 1:
-            self.clock.tick(60)
-
-            self.render()
-            pygame.display.flip()
-
-            self.process_events()
-            self.execute_game_logic()
+            turbo = self.is_turbo()
+            if event is None and self.is_idle():
+                event = self.wait_for_event()
+                if event is None:
+                    with self.lock:
+                        self.execute_game_logic()
+                    continue
+            elif not turbo:
+                self.clock.tick(60)
+
+            with self.lock:
+                if event is not None:
+                    self.process_event(event)
+                    event = None
+                self.frame_skipped = False
+                if turbo and time.time() < next_turbo_frame and not self.is_idle():
+                    self.frame_skipped = True
+                else:
+                    next_turbo_frame = time.time() + 1 / self.turbo_fps
+                    if self.threaded_rendering:
+                        self.publish_scene()
+                    else:
+                        self.update_display(self.render())
+
+                self.process_events()
+                self.execute_game_logic()
+
+            # E.g. a pulsing background keeps the game from idling, but has nothing to do
+            # until the next frame is drawn.
+            if self.frame_skipped and self.time_until_next_call_ms() != 0:
+                wait_ms = math.ceil((next_turbo_frame - time.time()) * 1000)
+                if wait_ms > 0:
+                    event = self.wait_for_event(wait_ms)
 
     def execute(self):
-        """ Initializes game, starts rendering thread and starts game endless loop """
-        self.init_game()
-        # self.start_render_thread()
+        """ Initializes game, starts rendering thread if enabled and starts game endless loop """
+        with self.lock:
+            self.init_game()
+        if self.threaded_rendering:
+            self.start_render_thread()
         self.run_game_loop()
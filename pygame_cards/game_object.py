@@ -20,6 +20,9 @@ class GameObject(object, metaclass=abc.ABCMeta):
         """
         self.children = children
         self.grab_policy = grab_policy
+        # What was on screen at the previous get_dirty_rects() call.
+        self._rendered_snapshot = None
+        self._rendered_bounds = None
 
     def add_child(self, child):
         """ Adds child to the list of children objects of a composite object.
@@ -37,6 +40,56 @@ class GameObject(object, metaclass=abc.ABCMeta):
             child.render(screen)
         self.render(screen)
 
+    def get_draw_list(self):
+        """ Returns what render_all() draws as a list of (surface, position), bottom to top,
+        for scene snapshots (see scene.Scene). Objects that return None (the default) are left
+        out of snapshots. The surfaces must not be modified afterwards.
+        """
+        return None
+
+    def render_snapshot(self):
+        """ Returns a value that compares equal for as long as render_all() would draw the same
+        thing, used to find out what changed between two frames. Objects that return None (the
+        default) are redrawn together with the whole screen on every frame.
+        """
+        return None
+
+    def get_bounds(self):
+        """ Returns the screen area covered by render_all() as a rect (x, y, width, height),
+        or None if nothing is drawn.
+        """
+        return None
+
+    @property
+    def rendered_bounds(self):
+        """ Screen area covered at the previous get_dirty_rects() call. """
+        return self._rendered_bounds
+
+    def get_dirty_rects(self):
+        """ Returns the screen areas to redraw since the previous call: where the object was
+        drawn before and where it is drawn now, if anything changed.
+        :return: list of rects, or None if the whole screen has to be redrawn
+        """
+        snapshot = self.render_snapshot()
+        if snapshot is None:
+            return None
+        if snapshot is self._rendered_snapshot or snapshot == self._rendered_snapshot:
+            return []
+        bounds = self.get_bounds()
+        rects = [rect for rect in (self._rendered_bounds, bounds) if rect is not None]
+        self._rendered_snapshot = snapshot
+        self._rendered_bounds = bounds
+        return rects
+
+    def forget_rendered(self):
+        """ Forgets what was on screen, so the next get_dirty_rects() reports the object as new.
+        :return: screen area covered at the previous get_dirty_rects() call, or None
+        """
+        bounds = self._rendered_bounds
+        self._rendered_snapshot = None
+        self._rendered_bounds = None
+        return bounds
+
     @abc.abstractmethod
     def render(self, screen):
         """ Renders current object. Should be implemented in each derived class.
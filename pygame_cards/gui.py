@@ -3,12 +3,31 @@ try:
     import sys
     import abc
     import pygame
-    from threading import Timer
 except ImportError as err:
     print("Fail loading a module in file:", __file__, "\n", err)
     sys.exit(2)
 
 
+# Fonts shared by all GUI elements, keyed by (face, size, bold). SysFont() searches the
+# system fonts, which is slow, so each font is created only once.
+_fonts = {}
+
+
+def get_font(size, face='arial', bold=True):
+    """ Returns the shared font with the given face, size and weight.
+    :param size: integer text size
+    :param face: font name passed to pygame.font.SysFont
+    :param bold: boolean, True for a bold font
+    :return: pygame.font.Font object
+    """
+    key = (face, size, bool(bold))
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(face, size, bold=bold)
+        _fonts[key] = font
+    return font
+
+
 class AbstractGUI(metaclass=abc.ABCMeta):
     def __init__(self, screen, text="", text_size=15, color=(0, 0, 0), id_=""):
         self.screen = screen
@@ -16,11 +35,60 @@ class AbstractGUI(metaclass=abc.ABCMeta):
         self.text_size = text_size
         self.color = color
         self.id_ = id_
+        self.font = get_font(self.text_size)
+        self._text_surface = None
+        self._text_surface_key = None  # (text, color) the text surface was rendered with
+        # What was on screen at the previous get_dirty_rects() call.
+        self._rendered_snapshot = None
+        self._rendered_rect = None
 
     @abc.abstractmethod
     def check_mouse(self, p, down):
         pass
 
+    def get_text_surface(self):
+        """ Returns the text rendered with the element's font. It is rendered again only after
+        the text or the color changed.
+        :return: pygame.Surface
+        """
+        key = (self.text, self.color if isinstance(self.color, str) else tuple(self.color))
+        if key != self._text_surface_key:
+            self._text_surface = self.font.render(self.text, True, self.color)
+            self._text_surface_key = key
+        return self._text_surface
+
+    def get_draw_list(self):
+        """ Returns what render() draws as a list of (surface, position), for scene snapshots
+        (see scene.Scene). The surfaces are not modified afterwards.
+        """
+        return []
+
+    def render_snapshot(self):
+        """ Returns a value that compares equal for as long as render() would draw the same. """
+        return (self.text, self.color)
+
+    def get_rect(self):
+        """ Returns the screen area covered by render() as a pygame.Rect. """
+        return pygame.Rect(0, 0, 0, 0)
+
+    @property
+    def rendered_rect(self):
+        """ Screen area covered at the previous get_dirty_rects() call, or None. """
+        return self._rendered_rect
+
+    def get_dirty_rects(self):
+        """ Returns the screen areas to redraw since the previous call: where the element was
+        drawn before and where it is drawn now, if anything changed.
+        """
+        snapshot = self.render_snapshot()
+        if snapshot == self._rendered_snapshot:
+            return []
+        rect = self.get_rect()
+        rects = [r for r in (self._rendered_rect, rect) if r is not None]
+        self._rendered_snapshot = snapshot
+        self._rendered_rect = rect
+        return rects
+
 
 class Button(AbstractGUI):
     inner_color = (191, 191, 191)
@@ -35,8 +103,6 @@ class Button(AbstractGUI):
     def __init__(self, screen, rect, onclick, text="", text_size=15, color=(0, 0, 0), id_=""):
         AbstractGUI.__init__(self, screen, text, text_size, color, id_)
         self.onclick = onclick
-        self.font = pygame.font.SysFont('arial', self.text_size, bold=1)
-        self.text_surface = self.font.render(self.text, True, color)
         text_size = self.font.size(self.text)
         self.rect = (rect[0], rect[1],
                      text_size[0] + 2 * Button.text_margin[0],
@@ -44,17 +110,38 @@ class Button(AbstractGUI):
         self.text_pos = (self.rect[0] + (self.rect[2] - text_size[0])/2,
                          self.rect[1] + (self.rect[3] - text_size[1])/2)
         self.pressed = False
+        self._surfaces = {}  # The button drawn in each state, keyed by (pressed, text, color)
+
+    def get_surface(self):
+        """ Returns the button drawn in its current state, drawn only once per state.
+        :return: pygame.Surface of the button's size
+        """
+        key = (self.pressed, self.text, self.color if isinstance(self.color, str) else tuple(self.color))
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface(self.rect[2:])
+            rect = (0, 0, self.rect[2], self.rect[3])
+            if self.pressed:
+                pygame.draw.rect(surface, Button.inner_pressed_color, rect)
+                pygame.draw.rect(surface, Button.frame_color, rect, Button.frame_pressed_thickness)
+            else:
+                pygame.draw.rect(surface, Button.inner_color, rect)
+                pygame.draw.rect(surface, Button.frame_color, rect, Button.frame_thickness)
+            surface.blit(self.get_text_surface(), (self.text_pos[0] - self.rect[0], self.text_pos[1] - self.rect[1]))
+            self._surfaces[key] = surface
+        return surface
 
     def render(self):
-        if self.pressed:
-            pygame.draw.rect(self.screen, Button.inner_pressed_color, self.rect)
-            pygame.draw.rect(self.screen, Button.frame_color, self.rect,
-                             Button.frame_pressed_thickness)
-        else:
-            pygame.draw.rect(self.screen, Button.inner_color, self.rect)
-            pygame.draw.rect(self.screen, Button.frame_color, self.rect, Button.frame_thickness)
+        self.screen.blit(self.get_surface(), self.rect[:2])
+
+    def get_draw_list(self):
+        return [(self.get_surface(), self.rect[:2])]
 
-        self.screen.blit(self.text_surface, self.text_pos)
+    def render_snapshot(self):
+        return (self.text, self.color, tuple(self.rect), self.pressed)
+
+    def get_rect(self):
+        return pygame.Rect(self.rect)
 
     def check_mouse(self, pos, down):
         if (self.rect[0] < pos[0] < self.rect[0] + self.rect[2] and
@@ -67,22 +154,41 @@ class Button(AbstractGUI):
 
 
 class Label(AbstractGUI):
-    def __init__(self, screen, pos, text="", text_size=15, color=(0, 0, 0), timeout=3, id_=""):
+    def __init__(self, screen, pos, text="", text_size=15, color=(0, 0, 0), timeout=3, id_="",
+                 scheduler=None):
+        """
+        :param timeout: seconds until the label expires, 0 if it never does
+        :param scheduler: scheduler.Scheduler that runs the timeout, required if timeout is set
+        """
         AbstractGUI.__init__(self, screen, text, text_size, color, id_)
-        self.font = pygame.font.SysFont('arial', self.text_size, bold=1)
         self.pos = pos
         self.expired = False
+        self.on_expire = None  # Called with the label once it has timed out
+        self.timer = None
         if timeout != 0:
-            self.timer = Timer(timeout, self.expire)
-            self.timer.start()
+            if scheduler is None:
+                raise ValueError('Label with a timeout needs a scheduler', 'Label.__init__')
+            self.timer = scheduler.schedule(timeout * 1000, self.expire)
 
     def expire(self):
         self.expired = True
+        if self.on_expire is not None:
+            self.on_expire(self)
 
     def render(self):
         if self.text != "":
-            text_surface = self.font.render(self.text, True, self.color)
-            self.screen.blit(text_surface, self.pos)
+            self.screen.blit(self.get_text_surface(), self.pos)
+
+    def get_draw_list(self):
+        if self.text == "":
+            return []
+        return [(self.get_text_surface(), (self.pos[0], self.pos[1]))]
+
+    def render_snapshot(self):
+        return (self.text, self.color, tuple(self.pos))
+
+    def get_rect(self):
+        return pygame.Rect((self.pos[0], self.pos[1]), self.font.size(self.text))
 
     def check_mouse(self, pos, down):
         """ No action on click for text label """
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+try:
+    import sys
+    import threading
+    import collections
+    import pygame
+except ImportError as err:
+    print("Fail loading a module in file:", __file__, "\n", err)
+    sys.exit(2)
+
+
+# Immutable snapshot of everything on screen, published by the game logic and drawn by the
+# render thread. Each layer is one game object or GUI element: a key that identifies it between
+# scenes and the images it draws, as a tuple of (surface, position) bottom to top. The surfaces
+# must not be modified after they were published.
+Scene = collections.namedtuple('Scene', ['background_color', 'layers'])
+Layer = collections.namedtuple('Layer', ['key', 'items'])
+
+
+def merge_rects(rects, bounds):
+    """ Merges overlapping rects and clips them to bounds, so that no area is drawn twice.
+    :param rects: list of rects (pygame.Rect or (x, y, width, height))
+    :param bounds: pygame.Rect of the screen
+    :return: list of pygame.Rect
+    """
+    merged = []
+    for rect in rects:
+        rect = bounds.clip(pygame.Rect(rect))
+        if rect.w == 0 or rect.h == 0:
+            continue
+        # Absorb every merged rect the new one overlaps, until none is left.
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+def items_bounds(items):
+    """ Returns the rect covered by a layer's items, or None if it draws nothing.
+    :param items: tuple of (surface, position)
+    """
+    if len(items) == 0:
+        return None
+    rects = [pygame.Rect(pos[0], pos[1], *surface.get_size()) for surface, pos in items]
+    return rects[0].unionall(rects[1:])
+
+
+class SceneBuffer(object):
+    """ Hands the latest scene from the game logic to the render thread. Scenes that were
+    published while the previous one was still being drawn are skipped.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.scene = None
+        self.version = 0
+        self.closed = False
+
+    def publish(self, scene):
+        """ Replaces the latest scene.
+        :param scene: Scene object
+        """
+        with self.condition:
+            self.scene = scene
+            self.version += 1
+            self.condition.notify_all()
+
+    def take(self, version, timeout=None):
+        """ Waits for a scene newer than version.
+        :param version: version returned by the previous call, 0 at first
+        :param timeout: seconds to wait at most, None to wait until a scene is published
+        :return: tuple (scene, version); scene is None on timeout or once the buffer is closed
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version or self.closed, timeout)
+            if self.closed or self.version == version:
+                return None, version
+            return self.scene, self.version
+
+    def close(self):
+        """ Wakes and stops the consumer. """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class SceneRenderer(object):
+    """ Draws scenes onto the screen, redrawing only the areas that changed since the
+    previously drawn scene: where changed, added or removed layers were and are drawn.
+    """
+
+    def __init__(self, screen):
+        """
+        :param screen: pygame.Surface of the display
+        """
+        self.screen = screen
+        self.full_redraw = True
+        self.background_color = None
+        self.drawn = {}  # Layer key -> (items, bounds) of the previously drawn scene
+
+    def draw(self, scene):
+        """ Draws the changed areas of the scene.
+        :param scene: Scene object
+        :return: list of redrawn rects, to be passed to pygame.display.update()
+        """
+        screen_rect = self.screen.get_rect()
+        full_redraw = self.full_redraw or scene.background_color != self.background_color
+        self.full_redraw = False
+        self.background_color = scene.background_color
+
+        dirty_rects = []
+        drawn = {}
+        layers = []  # (items, bounds) in draw order
+        for layer in scene.layers:
+            old = self.drawn.pop(layer.key, None)
+            if old is not None and old[0] == layer.items:
+                drawn[layer.key] = old
+            else:
+                drawn[layer.key] = (layer.items, items_bounds(layer.items))
+                dirty_rects.extend(r for r in (old and old[1], drawn[layer.key][1]) if r is not None)
+            layers.append(drawn[layer.key])
+        # What is left was removed from the scene.
+        dirty_rects.extend(bounds for items, bounds in self.drawn.values() if bounds is not None)
+        self.drawn = drawn
+
+        if not full_redraw:
+            dirty_rects = merge_rects(dirty_rects, screen_rect)
+            if sum(r.w * r.h for r in dirty_rects) > screen_rect.w * screen_rect.h // 2:
+                full_redraw = True
+        if full_redraw:
+            dirty_rects = [screen_rect]
+
+        for rect in dirty_rects:
+            self.screen.set_clip(rect)
+            self.screen.fill(scene.background_color)
+            for items, bounds in layers:
+                if bounds is not None and rect.colliderect(bounds):
+                    for surface, pos in items:
+                        self.screen.blit(surface, pos)
+        self.screen.set_clip(None)
+        return dirty_rects
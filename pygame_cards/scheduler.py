@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+try:
+    import sys
+    import time
+    import heapq
+    import itertools
+except ImportError as err:
+    print("Fail loading a module in file:", __file__, "\n", err)
+    sys.exit(2)
+
+
+class ScheduledCall(object):
+    """ A callback waiting in a Scheduler, returned by Scheduler.schedule(). """
+
+    def __init__(self, due_time, callback):
+        """
+        :param due_time: time.monotonic() value after which the callback runs
+        :param callback: function without arguments
+        """
+        self.due_time = due_time
+        self.callback = callback
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        """ Keeps the callback from running, if it has not run yet. """
+        self.cancelled = True
+
+    @property
+    def pending(self):
+        return not (self.cancelled or self.done)
+
+
+class Scheduler(object):
+    """ Runs callbacks after a delay on the thread that calls run_due(), which GameApp does
+    once per frame, so callbacks change game objects like the rest of the game logic does.
+    Calls wait in a heap ordered by due time; cancelled calls are dropped when they reach
+    the top. Not thread-safe: use it from the game loop only.
+    """
+
+    def __init__(self):
+        self.heap = []  # (due time, sequence number, ScheduledCall)
+        self.counter = itertools.count()  # Keeps calls with the same due time in order
+
+    def schedule(self, delay_ms, callback):
+        """ Runs callback once delay_ms have passed.
+        :param delay_ms: delay in milliseconds
+        :param callback: function without arguments
+        :return: ScheduledCall object that can be cancelled
+        """
+        call = ScheduledCall(time.monotonic() + delay_ms / 1000, callback)
+        heapq.heappush(self.heap, (call.due_time, next(self.counter), call))
+        return call
+
+    def cancel_all(self):
+        """ Cancels all pending calls. """
+        for _, _, call in self.heap:
+            call.cancel()
+        self.heap = []
+
+    def drop_cancelled(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+
+    def time_until_next_ms(self):
+        """ Milliseconds until the next pending call is due, 0 if one is due already.
+        :return: float, or None if no call is pending
+        """
+        self.drop_cancelled()
+        if not self.heap:
+            return None
+        return max(0.0, (self.heap[0][0] - time.monotonic()) * 1000)
+
+    def run_due(self):
+        """ Runs the calls that are due, earliest first. Calls scheduled by the callbacks
+        with no delay run on the next call of run_due().
+        :return: number of callbacks that ran
+        """
+        now = time.monotonic()
+        ran = 0
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[2])
+        for call in due:
+            # A callback may cancel calls that are due as well.
+            if call.pending:
+                call.done = True
+                call.callback()
+                ran += 1
+        return ran
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Integer card encoding and bitmask hands for QNO.
+
+Every card of the 112-card deck gets a canonical id, its index in DECK. The deck is defined
+here (buildDeck(), also used by QNO), and the GUI and engine decks are built from DECK. A set of cards (a hand) is an int with bit
+*card_id* set for every card it contains, so the legality questions asked on every turn
+become integer operations against precomputed masks:
+
+    playable = hand & playable_mask(current_state, top_card.rank)
+    if playable: ...
+"""
+GATE = "Gate"
+STATES = ("|00>", "|01>", "|10>", "|11>")
+VALUES = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, "Draw Two", "Skip", "Reverse")
+GATE_VALUES = ("H", "X", "CNOT")
+GATE_COPIES = 4
+
+
+def buildDeck():
+    """ The cards of a QNO deck as [state, value] lists, in card id order: two of every
+    value of each state (one 0), followed by the gates.
+    """
+    deck = []
+    for state in STATES:
+        for value in VALUES:
+            deck.append([state, value])
+            if value != 0:
+                deck.append([state, value])
+    for i in range(GATE_COPIES):
+        for gate_value in GATE_VALUES:
+            deck.append([GATE, gate_value])
+    return deck
+
+
+# DECK[card_id] -> (state, value)
+DECK = tuple((state, value) for state, value in buildDeck())
+NUM_CARDS = len(DECK)
+ALL_CARDS = (1 << NUM_CARDS) - 1
+
+CARD_STATES = tuple(state for state, value in DECK)
+CARD_VALUES = tuple(value for state, value in DECK)
+
+
+def _mask(ids):
+    mask = 0
+    for card_id in ids:
+        mask |= 1 << card_id
+    return mask
+
+
+# Masks of all cards with a given state / value / (state, value), e.g. both copies of |01>-Skip.
+STATE_MASKS = {state: _mask(i for i, s in enumerate(CARD_STATES) if s == state)
+               for state in dict.fromkeys(CARD_STATES)}
+VALUE_MASKS = {value: _mask(i for i, v in enumerate(CARD_VALUES) if v == value)
+               for value in dict.fromkeys(CARD_VALUES)}
+KIND_MASKS = {kind: _mask(i for i, k in enumerate(DECK) if k == kind) for kind in dict.fromkeys(DECK)}
+GATE_MASK = STATE_MASKS[GATE]
+
+# PLAYABLE_MASKS[(current_state, top_value)] -> cards that may be played: gates, cards of the
+# current state and cards with the value of the top card of the discard pile.
+PLAYABLE_MASKS = {(state, value): GATE_MASK | STATE_MASKS.get(state, 0) | VALUE_MASKS[value]
+                  for state in STATE_MASKS for value in VALUE_MASKS}
+
+
+def playable_mask(current_state, top_value):
+    """ Cards that may be played in the given situation.
+    :param current_state: current basis state as a '|q1q0>' ket
+    :param top_value: value of the top card of the discard pile
+    """
+    return PLAYABLE_MASKS[(current_state, top_value)]
+
+
+def hand_mask(cards):
+    """ Bitmask of a list of cards that carry a card_id. """
+    mask = 0
+    for card_ in cards:
+        mask |= 1 << card_.card_id
+    return mask
+
+
+def ids_of(mask):
+    """ Card ids contained in *mask*, in ascending order. """
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
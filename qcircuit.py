@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Bounded game circuit for QNO.
+
+Every normal card play adds X gates to the game circuit and it used to grow until the next
+measurement, so simulating or drawing it got slower the longer a game lasted. GameCircuit
+keeps two things apart:
+
+- the live circuit, used for simulation. While the state is a classical basis state, runs of
+  X/CNOT gates are compacted into a single re-initialisation to that basis state, so its
+  length stays bounded.
+- a rolling history of the gates actually played, used to draw the circuit for the player.
+
+Gates are only recorded here. qiskit is imported, and QuantumCircuit objects built, the first
+time a feature actually needs one (drawing, the Aer measurement backend, the qiskit
+cross-check), so the game starts without loading the quantum SDK.
+"""
+import collections
+import importlib
+
+GateRecord = collections.namedtuple('GateRecord', 'name, args, basis_before')
+
+_qiskit = None
+
+
+def import_qiskit():
+    """ Import qiskit on first use.
+    :return: the qiskit module
+    """
+    global _qiskit
+    if _qiskit is None:
+        _qiskit = importlib.import_module('qiskit')
+    return _qiskit
+
+
+def qiskit_loaded():
+    """ Whether qiskit has been imported by this module. """
+    return _qiskit is not None
+
+
+def _append_record(qc, record):
+    if record.name == 'measure':
+        qc.measure_all()
+    elif record.name == 'initialize':
+        qc.initialize(record.args[0], qc.qubits)
+    else:
+        getattr(qc, record.name)(*record.args)
+
+
+def build_circuit(basis, records):
+    """ Build a two-qubit QuantumCircuit.
+    :param basis: initial basis state as a 'q1q0' string, or None to start from |00>
+    :param records: iterable of GateRecord to apply
+    :return: QuantumCircuit
+    """
+    qc = import_qiskit().QuantumCircuit(2)
+    if basis not in (None, '00'):
+        qc.initialize(basis, qc.qubits)
+    for record in records:
+        _append_record(qc, record)
+    return qc
+
+
+class GameCircuit:
+    """ Two-qubit game circuit with compaction and a bounded gate history. """
+
+    def __init__(self, history_length=64, compact_after=8):
+        """
+        :param history_length: number of played gates kept for drawing. The history is only
+            trimmed where the state is a known basis state, so it may be longer for a while.
+        :param compact_after: number of consecutive classical gates (X/CNOT on a basis state)
+            after which the live circuit is replaced by a basis-state re-initialisation
+        """
+        self.history = collections.deque()
+        self.history_length = history_length
+        self.compact_after = compact_after
+        self.initial_basis = '00'
+        self.ops = []
+        self.basis = None
+        self.classical_run = 0
+        self._circuit = None
+        self.reset()
+
+    def reset(self, basis='00'):
+        """ Start a new live circuit in the given basis state. The history is not touched.
+        :param basis: basis state as a 'q1q0' string
+        """
+        self.initial_basis = basis
+        self.ops = []
+        self._circuit = None
+        self.basis = int(basis, 2)
+        self.classical_run = 0
+
+    def clear(self):
+        """ Reset the live circuit to |00> and forget the history (new game). """
+        self.history.clear()
+        self.reset()
+
+    @property
+    def circuit(self):
+        """ The live circuit as a qiskit QuantumCircuit, built on first access. """
+        if self._circuit is None:
+            self._circuit = build_circuit(self.initial_basis, self.ops)
+        return self._circuit
+
+    @property
+    def basis_key(self):
+        """ Current classical basis state as a 'q1q0' string, or None after an H gate. """
+        if self.basis is None:
+            return None
+        return f'{self.basis:02b}'
+
+    def _record(self, name, *args):
+        record = GateRecord(name, args, self.basis_key)
+        self._add_to_history(record)
+        self.ops.append(record)
+        if self._circuit is not None:
+            _append_record(self._circuit, record)
+
+    def _add_to_history(self, record):
+        """ Appends a record and drops the oldest ones beyond history_length, such that the
+        history still starts from a known state: at a record played on a basis state, or at
+        an initialize record. A history that would start in a superposition is kept longer.
+        """
+        self.history.append(record)
+        excess = len(self.history) - self.history_length
+        if excess <= 0:
+            return
+        for start in range(excess, len(self.history)):
+            first = self.history[start]
+            if first.basis_before is not None or first.name == 'initialize':
+                for _ in range(start):
+                    self.history.popleft()
+                return
+
+    def _after_classical_gate(self):
+        if self.basis is None:
+            return
+        self.classical_run += 1
+        if self.classical_run >= self.compact_after:
+            self.reset(self.basis_key)
+
+    def x(self, qubit):
+        self._record('x', qubit)
+        if self.basis is not None:
+            self.basis ^= 1 << qubit
+        self._after_classical_gate()
+
+    def cx(self, control, target):
+        self._record('cx', control, target)
+        if self.basis is not None and self.basis & (1 << control):
+            self.basis ^= 1 << target
+        self._after_classical_gate()
+
+    def h(self, qubit):
+        self._record('h', qubit)
+        self.basis = None
+
+    def measure_all(self):
+        """ Add measurements to the live circuit. The state is unknown until initialize()
+        is called with the measured result.
+        """
+        self._record('measure')
+        self.basis = None
+
+    def initialize(self, basis):
+        """ Continue from a known basis state, e.g. the result of a measurement.
+        :param basis: basis state as a 'q1q0' string
+        """
+        self._add_to_history(GateRecord('initialize', (basis,), self.basis_key))
+        self.reset(basis)
+
+    def history_circuit(self):
+        """ Build a circuit from the recorded history, for display.
+        :return: QuantumCircuit starting from the oldest retained gate, in the state it was
+            played on (see _add_to_history())
+        """
+        if len(self.history) == 0:
+            return build_circuit(None, [])
+        return build_circuit(self.history[0].basis_before, self.history)
+
+    def draw(self, *args, **kwargs):
+        """ Draw the history circuit. Arguments are passed to QuantumCircuit.draw(). """
+        return self.history_circuit().draw(*args, **kwargs)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __str__(self):
+        return str(self.draw())
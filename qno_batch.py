@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Vectorized batch engine for QNO.
+
+BatchEngine plays B independent games between AI opponents in lockstep: every step, each
+unfinished game takes exactly one action, and all games are advanced together with NumPy
+array operations. The state is array-backed (card ids in stockpile/discard/hand arrays), the
+legal moves of the AI are computed with masks, and the opponents' method sampling and the
+H-gate measurements are drawn for all games at once.
+
+The rules, and the way randomness is consumed, are exactly those of qno_engine. Each game
+draws its random numbers from its own counter-based uniform stream (GameStream), so a
+scalar qno_engine game run with GameStream(seed) ends in the same state as the batch game
+with the same seed; validate() checks this.
+
+Example:
+    batch = BatchEngine(load_profiles(['Chester', 'Raz']), seeds=range(10000))
+    batch.run()
+    print(batch.winners.mean(axis=0))
+"""
+import numpy as np
+
+import qcards
+import qno_engine
+import qstate
+
+MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+
+# Card value indices. Numbers keep their value.
+DRAW_TWO, SKIP, REVERSE, GATE_X, GATE_CNOT, GATE_H = 10, 11, 12, 13, 14, 15
+VALUE_INDEX = dict({v: v for v in range(10)}, **{"Draw Two": DRAW_TWO, "Skip": SKIP, "Reverse": REVERSE,
+                                                 "X": GATE_X, "CNOT": GATE_CNOT, "H": GATE_H})
+GATE_STATE = 4  # State index of gate cards, basis states are 0-3.
+
+# Opponent method kinds, see opponent.Opponent.try_select_card().
+METHOD_KINDS = {"suit": 0, "rank": 1, "eight": 2, "random": 3}
+
+# Probability of the lower basis state after an H gate, exactly as qstate computes it.
+P_LOW = qstate.SQRT1_2 ** 2
+
+# POSSIBLE_STATES[state, gate - GATE_X] -> reachable basis states per choice, padded with -1.
+POSSIBLE_STATES = np.full((4, 3, 4), -1, dtype=np.int8)
+for _s, _ket in enumerate(qstate.KETS):
+    for _g, _gate in enumerate(("X", "CNOT", "H")):
+        for _j, _k in enumerate(qstate.POSSIBLE_STATES[(_ket, _gate)]):
+            POSSIBLE_STATES[_s, _g, _j] = int(_k[1:3], 2)
+
+# Game phases
+PLAY, CHOOSE_QUBIT, GUESS, OVER = 0, 1, 2, 3
+
+
+def _splitmix64(x):
+    """ SplitMix64 finalizer on a Python int. """
+    x = (x + _GOLDEN) & MASK64
+    x = ((x ^ (x >> 30)) * _MIX1) & MASK64
+    x = ((x ^ (x >> 27)) * _MIX2) & MASK64
+    return x ^ (x >> 31)
+
+
+def _splitmix64_array(x):
+    """ SplitMix64 finalizer on a uint64 array (arithmetic wraps around). """
+    x = x + np.uint64(_GOLDEN)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(_MIX1)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(_MIX2)
+    return x ^ (x >> np.uint64(31))
+
+
+class GameStream:
+    """ random.Random stand-in for qno_engine and opponent.Opponent that takes every value
+    from the counter-based uniform stream of one game. Each call consumes exactly one uniform
+    (shuffle: one per element), in the same way as BatchEngine.
+    """
+
+    def __init__(self, seed):
+        self.key = _splitmix64(seed & MASK64)
+        self.counter = 0
+
+    def random(self):
+        x = _splitmix64((self.key + self.counter * _GOLDEN) & MASK64)
+        self.counter += 1
+        return (x >> 11) * 2.0 ** -53
+
+    def randrange(self, n):
+        return int(self.random() * n)
+
+    def randint(self, a, b):
+        return a + self.randrange(b - a + 1)
+
+    def choice(self, seq):
+        return seq[self.randrange(len(seq))]
+
+    def shuffle(self, x):
+        """ Sort by one uniform per element (stable on ties). """
+        keys = [self.random() for _ in x]
+        x[:] = [x[i] for i in sorted(range(len(x)), key=keys.__getitem__)]
+
+
+class BatchEngine:
+    """ B games between the same AI opponents, advanced in lockstep. """
+
+    def __init__(self, profiles_json, seeds, replenish_stack=True, deck=None):
+        """
+        :param profiles_json: opponents.json entries, one per seat (2-7)
+        :param seeds: one seed per game
+        :param replenish_stack: see qno_engine.Engine
+        :param deck: list of (state, value) tuples to play with (default: the full QNO deck,
+            qcards.DECK), e.g. to study other deck compositions
+        """
+        deck = qcards.DECK if deck is None else deck
+        self.card_state = np.array([GATE_STATE if s == qcards.GATE else int(s[1:3], 2) for s, v in deck], dtype=np.int8)
+        self.card_value = np.array([VALUE_INDEX[v] for s, v in deck], dtype=np.int8)
+        self.num_cards = len(deck)
+        self.replenish_stack = replenish_stack
+
+        self.num_players = P = len(profiles_json)
+        self.method_kind = np.zeros((P, len(METHOD_KINDS)), dtype=np.int8)
+        self.method_weight = np.zeros((P, len(METHOD_KINDS)), dtype=np.int64)
+        for p, profile in enumerate(profiles_json):
+            for j, (name, weight) in enumerate(profile["methods"].items()):
+                self.method_kind[p, j] = METHOD_KINDS[name]
+                self.method_weight[p, j] = weight
+
+        seeds = np.asarray(seeds, dtype=np.int64).astype(np.uint64)
+        self.num_games = B = len(seeds)
+        self.key = _splitmix64_array(seeds)
+        self.cursor = np.zeros(B, dtype=np.uint64)
+
+        N = self.num_cards
+        self.stock = np.zeros((B, N), dtype=np.int16)
+        self.stock_len = np.zeros(B, dtype=np.int64)
+        self.discard = np.zeros((B, N), dtype=np.int16)
+        self.discard_len = np.zeros(B, dtype=np.int64)
+        self.hands = np.zeros((B, P, 32), dtype=np.int16)  # widened when a hand outgrows it
+        self.hand_len = np.zeros((B, P), dtype=np.int64)
+        self.direction = np.zeros(B, dtype=np.int64)
+        self.turn = np.zeros(B, dtype=np.int64)
+        self.dealer = np.zeros(B, dtype=np.int64)
+        self.phase = np.full(B, PLAY, dtype=np.int8)
+        self.state = np.zeros(B, dtype=np.int64)  # basis state, the lower branch during GUESS
+        self.h_qubit = np.zeros(B, dtype=np.int64)  # qubit in superposition during GUESS
+
+        # statistics, as in qno_engine.GameState
+        self.turns = np.zeros(B, dtype=np.int64)
+        self.cards_drawn = np.zeros((B, P), dtype=np.int64)
+        self.gates_played = np.zeros((B, P), dtype=np.int64)
+        self.winners = np.zeros((B, P), dtype=bool)
+        self.steps = 0
+
+    # random streams
+
+    def _uniforms(self, g, n):
+        """ The next *n* uniforms of the streams of games *g*, shape (len(g), n). """
+        counters = self.cursor[g][:, None] + np.arange(n, dtype=np.uint64)
+        self.cursor[g] += np.uint64(n)
+        x = _splitmix64_array(self.key[g][:, None] + counters * np.uint64(_GOLDEN))
+        return (x >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def _shuffle_stock(self, g):
+        """ Shuffle the stockpiles of games *g* like GameStream.shuffle(). """
+        lengths = self.stock_len[g]
+        for n in np.unique(lengths):
+            rows = g[lengths == n]
+            perm = np.argsort(self._uniforms(rows, n), axis=1, kind='stable')
+            self.stock[rows, :n] = np.take_along_axis(self.stock[rows, :n], perm, axis=1)
+
+    # game flow
+
+    def run(self, max_steps=None):
+        """ Play all games to the end.
+        :param max_steps: stop after this many lockstep steps (default: no limit)
+        """
+        self.new_games()
+        while max_steps is None or self.steps < max_steps:
+            if not self.step():
+                break
+        return self
+
+    def new_games(self):
+        """ Shuffle, deal and play the first card, for all games. """
+        B, P, N = self.num_games, self.num_players, self.num_cards
+        g = np.arange(B)
+        self.stock[:] = np.arange(N, dtype=np.int16)
+        self.stock_len[:] = N
+        self._shuffle_stock(g)
+        self.dealer[:] = (self._uniforms(g, 1)[:, 0] * P).astype(np.int64)
+
+        for i in range(qno_engine.CARDS_PER_PLAYER * P):
+            self._give(g, (self.dealer + 1 + i) % P, self._pop_stock(g))
+
+        # never start the discard pile with a gate
+        while True:
+            on_top = self.stock[g, self.stock_len[g] - 1]
+            gate = g[self.card_state[on_top] == GATE_STATE]
+            if not gate.size:
+                break
+            self._shuffle_stock(gate)
+
+        self.turn[:] = self.dealer
+        self._play(g, self._pop_stock(g))
+
+    def step(self):
+        """ Let every unfinished game take one action.
+        :return: False once all games are over
+        """
+        phase = self.phase
+        active = phase != OVER
+        if not active.any():
+            return False
+        self.steps += 1
+        play = np.flatnonzero(phase == PLAY)
+        choose = np.flatnonzero(phase == CHOOSE_QUBIT)
+        guess = np.flatnonzero(phase == GUESS)
+        if play.size:
+            self._step_play(play)
+        if choose.size:
+            self._step_choose_qubit(choose)
+        if guess.size:
+            self._step_guess(guess)
+        return True
+
+    def _step_play(self, g):
+        p = self.turn[g]
+        hands = self.hands[g, p]
+        valid = np.arange(hands.shape[1]) < self.hand_len[g, p][:, None]
+        states = self.card_state[hands]
+        values = self.card_value[hands]
+        top_value = self.card_value[self.discard[g, self.discard_len[g] - 1]]
+
+        # matches[kind]: cards each opponent method would choose from
+        by_suit = (states == self.state[g][:, None]) & valid
+        by_rank = (values == top_value[:, None]) & valid
+        gates = (states == GATE_STATE) & valid
+        matches = np.stack([by_suit, by_rank, gates, by_suit | by_rank], axis=1)
+        counts = matches.sum(axis=2)
+
+        playable = counts[:, 2] + counts[:, 3] > 0
+        draw = ~playable
+        if draw.any():
+            gd = g[draw]
+            self._draw(gd, p[draw], 1)
+            gd = gd[(self.phase[gd] != OVER) & (self.stock_len[gd] == 0)]
+            if gd.size:
+                self._repopulate(gd)
+
+        rows = np.flatnonzero(playable)
+        if not rows.size:
+            return
+        # Opponent.try_select_card(): draw methods by weight, without replacement, until one finds a card.
+        kinds = self.method_kind[p[rows]]
+        remaining = self.method_weight[p[rows]].copy()
+        position = np.zeros(rows.size, dtype=np.int64)
+        pending = np.arange(rows.size)
+        while pending.size:
+            weights = remaining[pending]
+            choice = (self._uniforms(g[rows[pending]], 1)[:, 0] * weights.sum(axis=1)).astype(np.int64)
+            slot = np.argmax(weights.cumsum(axis=1) > choice[:, None], axis=1)
+            kind = kinds[pending, slot]
+            count = counts[rows[pending], kind]
+            found = count > 0
+
+            f = pending[found]
+            if f.size:
+                kth = (self._uniforms(g[rows[f]], 1)[:, 0] * count[found]).astype(np.int64)
+                candidates = matches[rows[f], kind[found]]
+                position[f] = np.argmax(candidates.cumsum(axis=1) > kth[:, None], axis=1)
+            remaining[pending[~found], slot[~found]] = 0
+            pending = pending[~found]
+
+        gp, pp = g[rows], p[rows]
+        cards = hands[rows, position]
+        self._remove_from_hand(gp, pp, position)
+        self._play(gp, cards)
+        won = gp[(self.phase[gp] != OVER) & (self.hand_len[gp, pp] == 0)]
+        if won.size:
+            self._game_over(won)
+
+    def _step_choose_qubit(self, g):
+        p = self.turn[g]
+        hands = self.hands[g, p]
+        valid = np.arange(hands.shape[1]) < self.hand_len[g, p][:, None]
+        states = np.where(valid, self.card_state[hands], -2)
+        gate = self.card_value[self.discard[g, self.discard_len[g] - 1]].astype(np.int64)
+        possible = POSSIBLE_STATES[self.state[g], gate - GATE_X]
+
+        # opponent.Opponent.choose_suit(): the first possible state with the most cards in hand
+        counts = (states[:, None, :] == possible[:, :, None]).sum(axis=2)
+        counts[possible < 0] = -1
+        choice = np.argmax(counts, axis=1)
+        h = gate == GATE_H
+        choice[h] = np.where(choice[h] < 2, 0, 1)
+        qubit = np.asarray(qno_engine.CHOICE_QUBITS)[choice]
+
+        bit = np.left_shift(1, qubit)
+        other = np.left_shift(1, 1 - qubit)
+        state = self.state[g]
+        state = np.where(gate == GATE_X, state ^ bit, state)
+        state = np.where((gate == GATE_CNOT) & (state & bit != 0), state ^ other, state)
+        self.state[g] = state & ~np.where(h, bit, 0)  # lower branch of the superposition
+        self.h_qubit[g] = qubit
+
+        self.phase[g[h]] = GUESS
+        gn = g[~h]
+        self.phase[gn] = PLAY
+        self._next_turn(gn, 0)
+
+    def _step_guess(self, g):
+        low = self.state[g]
+        high = low | np.left_shift(1, self.h_qubit[g])
+        u = np.empty((g.size, 2))
+        # Guess (Opponent's rng.choice() over both kets), then the measurement.
+        u[:, 0] = self._uniforms(g, 1)[:, 0]
+        u[:, 1] = self._uniforms(g, 1)[:, 0]
+        prediction = np.where((u[:, 0] * 2).astype(np.int64) == 0, low, high)
+        result = np.where(u[:, 1] < P_LOW, low, high)
+        self.state[g] = result
+        self.phase[g] = PLAY
+
+        correct = prediction == result
+        gc = g[correct]
+        self._draw(gc, self._player_after(gc), 4)
+        gw = g[~correct]
+        self._draw(gw, self.turn[gw], 1)
+        g = g[self.phase[g] != OVER]
+        self._next_turn(g, 0)
+
+    # rules, see qno_engine.Engine
+
+    def _player_after(self, g):
+        step = np.where(self.direction[g] == 0, 1, -1)
+        return (self.turn[g] + step) % self.num_players
+
+    def _next_turn(self, g, players_to_skip):
+        self.turns[g] += 1
+        step = np.where(self.direction[g] == 0, 1, -1)
+        self.turn[g] = (self.turn[g] + step * (1 + players_to_skip)) % self.num_players
+
+    def _pop_stock(self, g):
+        self.stock_len[g] -= 1
+        return self.stock[g, self.stock_len[g]]
+
+    def _give(self, g, p, cards):
+        idx = self.hand_len[g, p]
+        if idx.size and idx.max() >= self.hands.shape[2]:
+            width = min(2 * self.hands.shape[2], self.num_cards)
+            hands = np.zeros(self.hands.shape[:2] + (width,), dtype=self.hands.dtype)
+            hands[:, :, :self.hands.shape[2]] = self.hands
+            self.hands = hands
+        self.hands[g, p, idx] = cards
+        self.hand_len[g, p] += 1
+
+    def _remove_from_hand(self, g, p, position):
+        hands = self.hands[g, p]
+        cols = np.arange(hands.shape[1])
+        shifted = np.minimum(cols + 1, hands.shape[1] - 1)
+        self.hands[g, p] = np.where(cols >= position[:, None], hands[:, shifted], hands)
+        self.hand_len[g, p] -= 1
+
+    def _play(self, g, cards):
+        self.discard[g, self.discard_len[g]] = cards
+        self.discard_len[g] += 1
+        values = self.card_value[cards]
+
+        reverse = values == REVERSE
+        self.direction[g[reverse]] ^= 1
+        normal = reverse | (values <= 9)
+        self._after_playing_card(g[normal], cards[normal], 0)
+
+        skip = values == SKIP
+        self._after_playing_card(g[skip], cards[skip], 1)
+
+        draw_two = values == DRAW_TWO
+        gd = g[draw_two]
+        self._draw(gd, self._player_after(gd), 2)
+        live = self.phase[gd] != OVER
+        self._after_playing_card(gd[live], cards[draw_two][live], 0)
+
+        gate = values >= GATE_X
+        gg = g[gate]
+        self.gates_played[gg, self.turn[gg]] += 1
+        self.phase[gg] = CHOOSE_QUBIT
+
+    def _after_playing_card(self, g, cards, players_to_skip):
+        if not g.size:
+            return
+        self.state[g] = self.card_state[cards]
+        self._next_turn(g, players_to_skip)
+        empty = g[self.stock_len[g] == 0]
+        if empty.size:
+            self._repopulate(empty)
+
+    def _draw(self, g, p, num_cards):
+        for i in range(num_cards):
+            live = self.phase[g] != OVER
+            g, p = g[live], p[live]
+            empty = self.stock_len[g] == 0
+            if empty.any():
+                self._repopulate(g[empty])
+                live = self.phase[g] != OVER
+                g, p = g[live], p[live]
+                empty = self.stock_len[g] == 0
+                if empty.any():  # Nothing left to reshuffle.
+                    self._game_over(g[empty])
+                    g, p = g[~empty], p[~empty]
+            if not g.size:
+                return
+            self._give(g, p, self._pop_stock(g))
+            self.cards_drawn[g, p] += 1
+
+    def _repopulate(self, g):
+        if not self.replenish_stack:
+            self._game_over(g)
+            return
+        # Move all but the top card of the discard pile, bottom first, then shuffle. The
+        # stockpile is always empty at this point.
+        n = self.discard_len[g] - 1
+        moved = np.arange(self.num_cards) < n[:, None]
+        stock = self.stock[g]
+        stock[moved] = self.discard[g][moved]
+        self.stock[g] = stock
+        self.stock_len[g] = n
+        self.discard[g, 0] = self.discard[g, n]
+        self.discard_len[g] = 1
+        self._shuffle_stock(g)
+
+    def _game_over(self, g):
+        self.phase[g] = OVER
+        hand_len = self.hand_len[g]
+        self.winners[g] = hand_len == hand_len.min(axis=1, keepdims=True)
+
+    def hand(self, game, player):
+        """ Card ids in a player's hand, in order. """
+        return self.hands[game, player, :self.hand_len[game, player]].tolist()
+
+
+def validate(profiles_json, seeds, **kwargs):
+    """ Play the same games with BatchEngine and with the scalar qno_engine, and compare.
+    :param profiles_json: opponents.json entries, one per seat
+    :param seeds: game seeds
+    :param kwargs: further arguments for both engines (replenish_stack)
+    :return: list of seeds whose games ended differently (empty if all match)
+    """
+    import opponent
+
+    batch = BatchEngine(profiles_json, seeds, **kwargs).run()
+    mismatches = []
+    for b, seed in enumerate(seeds):
+        stream = GameStream(seed)
+        profiles = [opponent.Opponent(p, rng=stream) for p in profiles_json]
+        s = qno_engine.run_game(profiles, rng=stream, **kwargs)
+        same = (
+            s.turns == batch.turns[b]
+            and s.winners == np.flatnonzero(batch.winners[b]).tolist()
+            and s.cards_drawn == batch.cards_drawn[b].tolist()
+            and s.gates_played == batch.gates_played[b].tolist()
+            and all([c.card_id for c in s.hands[p]] == batch.hand(b, p) for p in range(len(profiles)))
+            and [c.card_id for c in s.stockpile] == batch.stock[b, :batch.stock_len[b]].tolist()
+            and [c.card_id for c in s.discard] == batch.discard[b, :batch.discard_len[b]].tolist()
+            and stream.counter == batch.cursor[b]
+        )
+        if not same:
+            mismatches.append(seed)
+    return mismatches
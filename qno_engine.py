@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Headless QNO rules engine.
+
+The rules of QNO as played by QNO_GUI.Crazy8sController, without pygame, animations or
+timers: a GameState holds plain lists of cards and the two-qubit state, and Engine advances
+it one action at a time through apply(). A complete game between AI opponents takes about a
+millisecond (some 700-1000 games per second per core, depending on the number of players),
+which makes the engine usable for self-play; qno_batch plays many games at once for larger
+studies.
+
+The GUI controller does not run on this engine. It shares the rule helpers of this module
+(player_after(), can_play(), apply_gate(), ai_qubit_choice(), process_score()), but its
+animation-driven flow keeps a second copy of the rest of the rules: dealing, Draw Two, Skip
+and Reverse, the qubit choice and measurement, replenishing the stockpile and the end of the
+game. A change to those rules has to be made in Engine and in Crazy8sController alike.
+
+Example:
+    engine = Engine(3, rng=random.Random(42))
+    engine.new_game()
+    while not engine.is_over:
+        engine.apply(engine.ai_action(profiles[engine.state.turn]))
+"""
+import collections
+import random
+
+import qcards
+import qstate
+import measurement
+
+# Game phases
+PLAY = "PLAY"                  # the current player plays or draws a card
+CHOOSE_QUBIT = "CHOOSE_QUBIT"  # a gate was played, the current player chooses the qubit
+GUESS = "GUESS"                # the state is in a superposition, the current player guesses the measurement
+OVER = "OVER"
+
+# Actions
+PlayCard = collections.namedtuple('PlayCard', 'index')      # index of the card in the current player's hand
+DrawCard = collections.namedtuple('DrawCard', '')
+ChooseQubit = collections.namedtuple('ChooseQubit', 'choice')  # index into CHOICE_QUBITS
+Guess = collections.namedtuple('Guess', 'prediction')       # predicted state as a '|q1q0>' ket
+
+# Qubit acted on for each player choice, in the order of QNO_GUI.suit_info (q1 first, then q0).
+CHOICE_QUBITS = (1, 0)
+
+CARDS_PER_PLAYER = 5
+
+
+class Card(collections.namedtuple('Card', 'suit, rank, card_id')):
+    """ Lightweight card with the same accessors as pygame_cards.card.Card. The card_id
+    (see qcards) tells the two copies of a card apart.
+    """
+    __slots__ = ()
+
+    def getState(self):
+        return self.suit
+
+    def getValue(self):
+        return self.rank
+
+
+def build_deck():
+    """ The full QNO deck as a list of Card, in card_id order. """
+    return [Card(state, value, card_id) for card_id, (state, value) in enumerate(qcards.DECK)]
+
+
+DECK = tuple(build_deck())
+
+
+def player_after(player_idx, direction, num_players):
+    """ Index of the player after *player_idx*.
+    :param direction: 0 for increasing player indices, 1 for decreasing
+    :param num_players: number of players, including the human player
+    """
+    if direction == 0:
+        return (player_idx + 1) % num_players
+    else:
+        return (player_idx - 1) % num_players
+
+
+def can_play(card_, current_state, top_card):
+    """ Whether *card_* may be played.
+    :param card_: card to play (qno_engine.Card or pygame_cards.card.Card)
+    :param current_state: current basis state as a '|q1q0>' ket
+    :param top_card: top card of the discard pile
+    """
+    return bool(qcards.PLAYABLE_MASKS[(current_state, top_card.rank)] >> card_.card_id & 1)
+
+
+def apply_gate(target, gate, qubit):
+    """ Apply a gate card to *target*.
+    :param target: object with x(), h() and cx() methods (qstate.TwoQubitState, qcircuit.GameCircuit)
+    :param gate: "X", "CNOT" or "H"
+    :param qubit: qubit chosen by the player
+    :return: True if a measurement is now required (H gate)
+    """
+    if gate == "X":
+        target.x(qubit)
+    elif gate == "H":
+        target.h(qubit)
+        return True
+    elif gate == "CNOT":
+        target.cx(qubit, (qubit + 1) % 2)
+    else:
+        raise ValueError(f'Unknown gate: {gate}')
+    return False
+
+
+def ai_qubit_choice(profile, hand, possible_states):
+    """ Let an AI opponent choose the qubit for the gate it played.
+    :param profile: opponent.Opponent
+    :param hand: the opponent's cards
+    :param possible_states: qstate.POSSIBLE_STATES entry for the played gate
+    :return: index into CHOICE_QUBITS
+    """
+    choice = profile.choose_suit(hand, possible_states)
+    if len(possible_states) > 2:  # H gate: two measurement branches are listed per qubit choice.
+        choice = 0 if choice in [0, 1] else 1
+    return choice
+
+
+def process_score(score):
+    """ Rank players by the number of cards left in their hand.
+    :param score: dictionary of player -> cards left
+    :return: list of (cards left, [players]) tuples, best first
+    """
+    score_board = []
+
+    unique_scores = sorted(set(score.values()))
+    for s in unique_scores:
+        player_list = [k for k, v in score.items() if v == s]
+        score_board.append((s, player_list))
+    return score_board
+
+
+class GameState:
+    """ Complete state of one QNO game. Plain data, the rules live in Engine. """
+
+    def __init__(self, num_players, deck):
+        """
+        :param num_players: number of players (2-7)
+        :param deck: list of Card to play with, the top card is the last one
+        """
+        self.num_players = num_players
+        self.stockpile = list(deck)
+        self.discard = []
+        self.hands = [[] for _ in range(num_players)]
+        self.hand_masks = [0] * num_players  # qcards bitmask of each hand
+        self.direction = 0
+        self.dealer = 0
+        self.turn = -1  # No one's turn yet
+        self.phase = PLAY
+        self.qstate = qstate.TwoQubitState()
+        self.current_state = qstate.KET_OF['00']  # '|q1q0>' ket, kets joined by '+' in a superposition
+        self.winners = None  # player indices with the fewest cards, once the game is over
+
+        # statistics
+        self.turns = 0
+        self.cards_drawn = [0] * num_players
+        self.gates_played = [0] * num_players
+
+    @property
+    def top_card(self):
+        return self.discard[-1]
+
+    @property
+    def current_hand(self):
+        return self.hands[self.turn]
+
+    def playable_mask(self):
+        """ qcards bitmask of the cards that may be played now. """
+        return qcards.PLAYABLE_MASKS[(self.current_state, self.discard[-1].rank)]
+
+    def add_to_hand(self, player_idx, card_):
+        self.hands[player_idx].append(card_)
+        self.hand_masks[player_idx] |= 1 << card_.card_id
+
+    def remove_from_hand(self, player_idx, index):
+        card_ = self.hands[player_idx].pop(index)
+        self.hand_masks[player_idx] &= ~(1 << card_.card_id)
+        return card_
+
+
+class Engine:
+    """ Applies the QNO rules to a GameState. """
+
+    def __init__(self, num_players, rng=None, replenish_stack=True, free_drawing=False,
+                 deck=None, measurement_backend=None):
+        """
+        :param num_players: number of players (2-7)
+        :param rng: random.Random-like object used for shuffling, dealing and measurements
+            (default: a new random.Random)
+        :param replenish_stack: reshuffle the discard pile into the stockpile when it runs out,
+            instead of ending the game
+        :param free_drawing: allow drawing a card while holding playable cards
+        :param deck: list of Card to play with, with qcards ids (default: DECK)
+        :param measurement_backend: measurement.MeasurementBackend (default: sampling from rng)
+        """
+        self.num_players = num_players
+        self.rng = random.Random() if rng is None else rng
+        self.replenish_stack = replenish_stack
+        self.free_drawing = free_drawing
+        self.deck = DECK if deck is None else deck
+        if measurement_backend is None:
+            measurement_backend = measurement.SamplingBackend(rng=self.rng)
+        self.measurement_backend = measurement_backend
+        self.state = None
+
+    @property
+    def is_over(self):
+        return self.state.phase == OVER
+
+    def new_game(self, dealer=None):
+        """ Shuffle, deal and play the first card of the discard pile.
+        :param dealer: index of the dealer (default: chosen at random)
+        :return: the new GameState
+        """
+        s = self.state = GameState(self.num_players, self.deck)
+        self.rng.shuffle(s.stockpile)
+        s.dealer = self.rng.randint(0, self.num_players - 1) if dealer is None else dealer
+
+        player_idx = self.player_after(s.dealer)
+        round_ = 0
+        while round_ < CARDS_PER_PLAYER:
+            if not s.stockpile:
+                raise Exception('Not enough cards.')
+            s.add_to_hand(player_idx, s.stockpile.pop())
+            if player_idx == s.dealer:
+                round_ += 1
+            player_idx = self.player_after(player_idx)
+
+        # never start the discard pile with a gate
+        while s.stockpile[-1].getState() == "Gate":
+            self.rng.shuffle(s.stockpile)
+        self._play(s.stockpile.pop(), game_start=True)
+        return s
+
+    def player_after(self, player_idx):
+        return player_after(player_idx, self.state.direction, self.num_players)
+
+    def can_play_card(self, card_):
+        s = self.state
+        return can_play(card_, s.current_state, s.top_card)
+
+    def has_playable_cards(self, player_idx):
+        s = self.state
+        return bool(s.hand_masks[player_idx] & s.playable_mask())
+
+    def legal_actions(self):
+        """ All actions the current player may take. """
+        s = self.state
+        if s.phase == PLAY:
+            playable = s.playable_mask()
+            actions = [PlayCard(i) for i, card_ in enumerate(s.current_hand) if playable >> card_.card_id & 1]
+            if self.free_drawing or not actions:
+                actions.append(DrawCard())
+            return actions
+        elif s.phase == CHOOSE_QUBIT:
+            return [ChooseQubit(i) for i in range(len(CHOICE_QUBITS))]
+        elif s.phase == GUESS:
+            return [Guess(ket) for ket in s.qstate.kets()]
+        return []
+
+    def apply(self, action):
+        """ Apply an action of the current player.
+        :param action: PlayCard, DrawCard, ChooseQubit or Guess
+        """
+        s = self.state
+        action_type = type(action)
+        if action_type is PlayCard:
+            self._require_phase(PLAY, action)
+            player_idx = s.turn
+            card_ = s.hands[player_idx][action.index]
+            if not s.playable_mask() >> card_.card_id & 1:
+                raise ValueError(f"Player {player_idx} can't play {card_} on {s.top_card} in state {s.current_state}.")
+            s.remove_from_hand(player_idx, action.index)
+            self._play(card_)
+            if s.phase != OVER and not s.hand_masks[player_idx]:
+                self._game_over()
+        elif action_type is DrawCard:
+            self._require_phase(PLAY, action)
+            if not self.free_drawing and self.has_playable_cards(s.turn):
+                raise ValueError(f'Player {s.turn} has playable cards!')
+            self._draw(1, s.turn)
+            if s.phase != OVER and not s.stockpile:
+                self._repopulate_stockpile()
+        elif action_type is ChooseQubit:
+            self._require_phase(CHOOSE_QUBIT, action)
+            measurement_required = apply_gate(s.qstate, s.top_card.getValue(), CHOICE_QUBITS[action.choice])
+            s.current_state = str(s.qstate)
+            if measurement_required:
+                s.phase = GUESS
+            else:
+                s.phase = PLAY
+                self._next_turn()
+        elif action_type is Guess:
+            self._require_phase(GUESS, action)
+            result = self.measurement_backend.measure(s.qstate, None)
+            s.qstate.initialize(result)
+            s.current_state = qstate.KET_OF[result]
+            s.phase = PLAY
+            #  If the player guesses correctly, then the next player draws four cards.
+            #  If the player guesses incorrectly, then the player must draw a single card.
+            if action.prediction == s.current_state:
+                self._draw(4, self.player_after(s.turn))
+            else:
+                self._draw(1, s.turn)
+            if s.phase != OVER:
+                self._next_turn()
+        else:
+            raise ValueError(f'Unknown action: {action}')
+
+    def ai_action(self, profile):
+        """ The action an AI opponent takes in the current situation.
+        :param profile: opponent.Opponent
+        """
+        s = self.state
+        hand = s.current_hand
+        if s.phase == CHOOSE_QUBIT:
+            possible_states = qstate.POSSIBLE_STATES[(s.current_state, s.top_card.getValue())]
+            return ChooseQubit(ai_qubit_choice(profile, hand, possible_states))
+        elif s.phase == GUESS:
+            return Guess(profile.rng.choice(s.qstate.kets()))
+        card_ = profile.try_select_card(hand, s.top_card, s.current_state)
+        if card_ is None:
+            return DrawCard()
+        return PlayCard(hand.index(card_))
+
+    def _require_phase(self, phase, action):
+        if self.state.phase != phase:
+            raise ValueError(f'{action} not allowed in phase {self.state.phase}.')
+
+    def _play(self, card_, game_start=False):
+        s = self.state
+        s.discard.append(card_)
+        if game_start:
+            s.turn = s.dealer
+
+        value = card_.getValue()
+        if value == "Reverse":
+            s.direction = (s.direction + 1) % 2
+            self._after_playing_card(card_)
+        elif value == "Skip":
+            self._after_playing_card(card_, players_to_skip=1)
+        elif value == "Draw Two":
+            self._draw(2, self.player_after(s.turn))
+            if s.phase != OVER:
+                self._after_playing_card(card_)
+        elif card_.getState() == "Gate":
+            s.gates_played[s.turn] += 1
+            s.phase = CHOOSE_QUBIT
+        else:
+            self._after_playing_card(card_)
+
+    def _after_playing_card(self, card_, players_to_skip=0):
+        s = self.state
+        s.current_state = card_.getState()
+        s.qstate.initialize(s.current_state[1:3])
+        self._next_turn(players_to_skip)
+        if not s.stockpile:
+            self._repopulate_stockpile()
+
+    def _next_turn(self, players_to_skip=0):
+        s = self.state
+        s.turns += 1
+        s.turn = self.player_after(s.turn)
+        for i in range(players_to_skip):
+            s.turn = self.player_after(s.turn)
+
+    def _draw(self, num_cards, player_idx):
+        s = self.state
+        for i in range(num_cards):
+            if not s.stockpile:
+                self._repopulate_stockpile()
+                if s.phase == OVER:
+                    return
+                if not s.stockpile:  # Nothing left to reshuffle.
+                    self._game_over()
+                    return
+            s.add_to_hand(player_idx, s.stockpile.pop())
+            s.cards_drawn[player_idx] += 1
+
+    def _repopulate_stockpile(self):
+        s = self.state
+        if not self.replenish_stack:
+            self._game_over()
+            return
+        # Move all but the top card of the discard pile, bottom first, then shuffle.
+        s.stockpile.extend(s.discard[:-1])
+        del s.discard[:-1]
+        self.rng.shuffle(s.stockpile)
+
+    def _game_over(self):
+        s = self.state
+        s.phase = OVER
+        score_board = process_score({idx: len(hand) for idx, hand in enumerate(s.hands)})
+        s.winners = score_board[0][1]
+
+
+def run_game(profiles, rng=None, **kwargs):
+    """ Play a complete game between AI opponents.
+    :param profiles: one opponent.Opponent per player
+    :param rng: random.Random-like object for the engine (default: a new random.Random)
+    :param kwargs: further Engine arguments
+    :return: the finished GameState
+    """
+    engine = Engine(len(profiles), rng=rng, **kwargs)
+    s = engine.new_game()
+    while s.phase != OVER:
+        engine.apply(engine.ai_action(profiles[s.turn]))
+    return s
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Native two-qubit state tracking for QNO.
+
+The game only ever uses two qubits and the X, H and CNOT gates, so the full state fits in
+four real amplitudes. Keeping them in a small NumPy array lets the controller update the
+state incrementally when a gate is played, instead of simulating the whole game circuit
+every time the current state is queried.
+
+Qubit ordering follows qiskit: amplitude index i has qubit k in bit k of i, and state keys
+are written as 'q1q0' (so '01' means q0=1, q1=0).
+"""
+import math
+import sys
+
+import numpy as np
+
+BASIS_KEYS = ('00', '01', '10', '11')
+KETS = tuple(sys.intern(f'|{k}>') for k in BASIS_KEYS)
+KET_OF = dict(zip(BASIS_KEYS, KETS))
+GATES = ('X', 'CNOT', 'H')
+
+SQRT1_2 = 1 / math.sqrt(2)  # Amplitude of each branch after an H gate
+
+
+def _permutation_matrix(mapping):
+    """ Build a 4x4 permutation matrix sending basis index i to mapping(i). """
+    m = np.zeros((4, 4))
+    for i in range(4):
+        m[mapping(i), i] = 1
+    return m
+
+
+def _hadamard_matrix(qubit):
+    """ Build the 4x4 matrix of a Hadamard gate acting on *qubit*. """
+    bit = 1 << qubit
+    m = np.zeros((4, 4))
+    for i in range(4):
+        if i & bit:
+            m[i ^ bit, i] = SQRT1_2
+            m[i, i] = -SQRT1_2
+        else:
+            m[i, i] = SQRT1_2
+            m[i | bit, i] = SQRT1_2
+    return m
+
+
+X_GATES = (
+    _permutation_matrix(lambda i: i ^ 1),
+    _permutation_matrix(lambda i: i ^ 2),
+)
+H_GATES = (
+    _hadamard_matrix(0),
+    _hadamard_matrix(1),
+)
+# CX_GATES[control] flips the other qubit when *control* is set.
+CX_GATES = (
+    _permutation_matrix(lambda i: i ^ 2 if i & 1 else i),
+    _permutation_matrix(lambda i: i ^ 1 if i & 2 else i),
+)
+
+
+def _gate_outcomes(ket, gate, qubit):
+    """ Outcomes of applying *gate* with the player's *qubit* choice to a basis state.
+    :return: tuple of (ket, probability) branches
+    """
+    state = int(ket[1:3], 2)
+    bit = 1 << qubit
+    other = 1 << (1 - qubit)
+    if gate == 'X':
+        return ((KETS[state ^ bit], 1.0),)
+    elif gate == 'CNOT':
+        return ((KETS[state ^ other if state & bit else state], 1.0),)
+    else:  # 'H': equal superposition of both values of the chosen qubit, in basis order.
+        return ((KETS[state & ~bit], 0.5), (KETS[state | bit], 0.5))
+
+
+# Precomputed transition table: 4 basis states x 3 gates x 2 qubit choices.
+# GATE_OUTCOMES[(ket, gate, qubit)] -> tuple of (ket, probability) branches.
+GATE_OUTCOMES = {(ket, gate, qubit): _gate_outcomes(ket, gate, qubit)
+                 for ket in KETS for gate in GATES for qubit in (1, 0)}
+
+# POSSIBLE_STATES[(ket, gate)] -> states reachable after the gate, listed per player choice
+# (choice 0 acts on q1, choice 1 on q0; see suit_info in QNO_GUI). For H both measurement
+# branches of each choice are listed, so there are 4 entries instead of 2.
+POSSIBLE_STATES = {(ket, gate): tuple(branch[0] for qubit in (1, 0)
+                                      for branch in GATE_OUTCOMES[(ket, gate, qubit)])
+                   for ket in KETS for gate in GATES}
+
+# BASIS_FLIPS[(from_ket, to_ket)] -> qubits to send through an X gate to go from one basis
+# state to the other.
+BASIS_FLIPS = {(a, b): tuple(q for q in (0, 1) if (int(a[1:3], 2) ^ int(b[1:3], 2)) & (1 << q))
+               for a in KETS for b in KETS}
+
+
+class TwoQubitState:
+    """ Two-qubit state vector, updated in place as gates are applied.
+
+    Queries are answered from a cached probability dictionary that is only rebuilt after the
+    state has changed, so asking for the current state several times per turn is cheap.
+    """
+
+    def __init__(self, basis='00'):
+        """
+        :param basis: initial basis state as a 'q1q0' string (default '00')
+        """
+        self.amplitudes = np.zeros(4)
+        self._probabilities = None
+        self._kets = None
+        self.initialize(basis)
+
+    def initialize(self, basis):
+        """ Reset the state to a basis state.
+        :param basis: basis state as a 'q1q0' string, e.g. '10'
+        """
+        self.amplitudes[:] = 0
+        self.amplitudes[int(basis, 2)] = 1
+        self._probabilities = {basis: 1.0}
+        self._kets = (KET_OF[basis],)
+
+    def _apply(self, matrix):
+        self.amplitudes = matrix @ self.amplitudes
+        self._probabilities = None
+        self._kets = None
+
+    def x(self, qubit):
+        """ Apply a Pauli-X gate to *qubit* (0 or 1). """
+        self._apply(X_GATES[qubit])
+
+    def h(self, qubit):
+        """ Apply a Hadamard gate to *qubit* (0 or 1). """
+        self._apply(H_GATES[qubit])
+
+    def cx(self, control, target):
+        """ Apply a CNOT gate. With two qubits the target is always the other qubit.
+        :param control: control qubit (0 or 1)
+        :param target: target qubit, must differ from control
+        """
+        if control == target:
+            raise ValueError(f'CNOT control and target must differ: {control}')
+        self._apply(CX_GATES[control])
+
+    def probabilities_dict(self):
+        """ Same contract as qiskit's Statevector.probabilities_dict(): non-zero
+        probabilities keyed by 'q1q0' strings, in ascending basis order.
+        """
+        if self._probabilities is None:
+            probabilities = self.amplitudes ** 2
+            self._probabilities = {BASIS_KEYS[i]: float(p)
+                                   for i, p in enumerate(probabilities) if p > 1e-12}
+        return self._probabilities
+
+    def kets(self):
+        """ States with a non-zero probability, as '|q1q0>' strings in ascending basis order. """
+        if self._kets is None:
+            self._kets = tuple(KET_OF[k] for k in self.probabilities_dict())
+        return self._kets
+
+    @property
+    def is_superposition(self):
+        return len(self.probabilities_dict()) != 1
+
+    def basis_state(self):
+        """ Return the current basis state as a 'q1q0' string, or None in a superposition. """
+        probabilities = self.probabilities_dict()
+        if len(probabilities) != 1:
+            return None
+        return next(iter(probabilities))
+
+    def matches(self, prob_dict, tolerance=1e-9):
+        """ Compare against a probability dictionary computed elsewhere (e.g. by qiskit).
+        :param prob_dict: dictionary of basis key -> probability
+        :return: True if both describe the same measurement distribution
+        """
+        own = self.probabilities_dict()
+        keys = {k for k, p in prob_dict.items() if p > tolerance}
+        if keys != set(own):
+            return False
+        return all(abs(own[k] - prob_dict[k]) <= tolerance for k in keys)
+
+    def __str__(self):
+        return '+'.join(self.kets())
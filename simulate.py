@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Self-play simulator for the AI opponent profiles of opponents.json.
+
+Plays headless games (see qno_engine) between the chosen profiles across a process pool and
+prints aggregated results per profile while the games are running.
+
+Games are played in chunks. Every chunk gets its own RNG stream derived from the base seed
+and the chunk index, so results depend only on --seed, --games and --chunk-size, not on the
+number of worker processes.
+
+Example:
+    python ./simulate.py --games 1000000 --profiles Chester Raz Katalina --seed 1
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import opponent
+import qno_batch
+import qno_engine
+
+
+def load_profiles(names, opponents_json_path='opponents.json'):
+    """ Look up opponent profiles by name.
+    :param names: list of profile names, repetitions allowed
+    :return: list of opponents.json entries, in the order of *names*
+    """
+    with open(opponents_json_path, 'r') as json_file:
+        profiles = {p["name"]: p for p in json.load(json_file)}
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        raise ValueError(f'Unknown profile(s): {", ".join(unknown)}. Available: {", ".join(profiles)}')
+    return [profiles[name] for name in names]
+
+
+def chunk_seed(seed, chunk_idx):
+    """ Seed of the RNG stream of one chunk of games. """
+    state = np.random.SeedSequence(seed, spawn_key=(chunk_idx,)).generate_state(4)
+    return int.from_bytes(state.tobytes(), 'little')
+
+
+class SimulationStats:
+    """ Aggregated results of a number of games. Stats of different chunks are combined
+    with merge().
+    """
+
+    def __init__(self, names):
+        """
+        :param names: profile names, one per seat
+        """
+        self.names = sorted(set(names))
+        self.games = 0
+        self.turns = 0
+        self.ended_by_score = 0  # games that ended with an empty stockpile instead of an empty hand
+        self.seat_games = dict.fromkeys(self.names, 0)
+        self.wins = dict.fromkeys(self.names, 0.0)  # shared wins count as a fraction
+        self.cards_drawn = dict.fromkeys(self.names, 0)
+        self.gates_played = dict.fromkeys(self.names, 0)
+
+    def add_game(self, state, seats):
+        """
+        :param state: finished qno_engine.GameState
+        :param seats: profile name of each player index
+        """
+        self.games += 1
+        self.turns += state.turns
+        if state.hands[state.winners[0]]:
+            self.ended_by_score += 1
+        for player_idx, name in enumerate(seats):
+            self.seat_games[name] += 1
+            self.cards_drawn[name] += state.cards_drawn[player_idx]
+            self.gates_played[name] += state.gates_played[player_idx]
+        for player_idx in state.winners:
+            self.wins[seats[player_idx]] += 1 / len(state.winners)
+
+    def add_batch(self, batch, seats):
+        """
+        :param batch: finished qno_batch.BatchEngine
+        :param seats: profile name of each player index
+        """
+        self.games += batch.num_games
+        self.turns += int(batch.turns.sum())
+        winner = batch.winners.argmax(axis=1)
+        self.ended_by_score += int((batch.hand_len[np.arange(batch.num_games), winner] > 0).sum())
+        shares = batch.winners / batch.winners.sum(axis=1, keepdims=True)
+        for player_idx, name in enumerate(seats):
+            self.seat_games[name] += batch.num_games
+            self.cards_drawn[name] += int(batch.cards_drawn[:, player_idx].sum())
+            self.gates_played[name] += int(batch.gates_played[:, player_idx].sum())
+            self.wins[name] += float(shares[:, player_idx].sum())
+
+    def merge(self, other):
+        self.games += other.games
+        self.turns += other.turns
+        self.ended_by_score += other.ended_by_score
+        for name in self.names:
+            self.seat_games[name] += other.seat_games[name]
+            self.wins[name] += other.wins[name]
+            self.cards_drawn[name] += other.cards_drawn[name]
+            self.gates_played[name] += other.gates_played[name]
+
+    def report(self):
+        """ Results as a multi-line string. """
+        if self.games == 0:
+            return 'No games played.'
+        lines = [f'games: {self.games}, mean length: {self.turns / self.games:.1f} turns, '
+                 f'ended by empty stockpile: {100 * self.ended_by_score / self.games:.1f}%',
+                 f'{"profile":<12} {"win rate":>9} {"drawn/game":>11} {"gates/game":>11}']
+        for name in sorted(self.names, key=lambda n: -self.wins[n] / max(self.seat_games[n], 1)):
+            n = max(self.seat_games[name], 1)
+            lines.append(f'{name:<12} {100 * self.wins[name] / n:>8.2f}% '
+                         f'{self.cards_drawn[name] / n:>11.2f} {self.gates_played[name] / n:>11.2f}')
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return {
+            "games": self.games,
+            "mean_length": self.turns / max(self.games, 1),
+            "ended_by_score": self.ended_by_score,
+            "profiles": {name: {
+                "seat_games": self.seat_games[name],
+                "win_rate": self.wins[name] / max(self.seat_games[name], 1),
+                "cards_drawn_per_game": self.cards_drawn[name] / max(self.seat_games[name], 1),
+                "gates_played_per_game": self.gates_played[name] / max(self.seat_games[name], 1),
+            } for name in self.names},
+        }
+
+
+# Per-process settings, set up once by init_worker().
+_worker = {}
+
+
+def init_worker(profiles_json, seed, engine_options, batch):
+    _worker["profiles_json"] = profiles_json
+    _worker["seed"] = seed
+    _worker["engine_options"] = engine_options
+    _worker["batch"] = batch
+
+
+def play_chunk(task):
+    """ Play one chunk of games.
+    :param task: (chunk index, number of games)
+    :return: SimulationStats of the chunk
+    """
+    chunk_idx, num_games = task
+    profiles_json = _worker["profiles_json"]
+    if _worker["batch"]:
+        return play_batch_chunk(chunk_idx, num_games)
+    rng = random.Random(chunk_seed(_worker["seed"], chunk_idx))
+    profiles = [opponent.Opponent(p, rng=rng) for p in profiles_json]
+    stats = SimulationStats([p.name for p in profiles])
+
+    seats = list(range(len(profiles)))
+    for i in range(num_games):
+        rng.shuffle(seats)  # Random seating, so no profile always sits after the same one.
+        state = qno_engine.run_game([profiles[s] for s in seats], rng=rng, **_worker["engine_options"])
+        stats.add_game(state, [profiles[s].name for s in seats])
+    return stats
+
+
+def play_batch_chunk(chunk_idx, num_games):
+    """ Play one chunk of games in lockstep with qno_batch. Seats are not shuffled, the
+    random dealer already varies who starts.
+    :return: SimulationStats of the chunk
+    """
+    profiles_json = _worker["profiles_json"]
+    first_seed = chunk_seed(_worker["seed"], chunk_idx) >> 66  # fits an int64 with room for the game index
+    batch = qno_batch.BatchEngine(profiles_json, first_seed + np.arange(num_games),
+                                  replenish_stack=_worker["engine_options"].get("replenish_stack", True))
+    batch.run()
+    stats = SimulationStats([p["name"] for p in profiles_json])
+    stats.add_batch(batch, [p["name"] for p in profiles_json])
+    return stats
+
+
+def simulate(profiles_json, games, seed=0, workers=None, chunk_size=1000, engine_options=None,
+             on_progress=None, batch=False):
+    """ Play *games* games between the given profiles.
+    :param profiles_json: opponents.json entries, one per seat (2-7)
+    :param workers: number of worker processes (default: number of CPUs; 1 plays in this process)
+    :param engine_options: further qno_engine.Engine arguments, e.g. {"replenish_stack": False}
+    :param batch: play each chunk in lockstep with qno_batch.BatchEngine instead of one game at a time
+    :param on_progress: called with the running SimulationStats after every chunk
+    :return: SimulationStats
+    """
+    if not 2 <= len(profiles_json) <= 7:
+        raise ValueError(f'QNO is played by 2-7 players, got {len(profiles_json)}.')
+    workers = workers or os.cpu_count()
+    engine_options = engine_options or {}
+    tasks = [(chunk_idx, min(chunk_size, games - start))
+             for chunk_idx, start in enumerate(range(0, games, chunk_size))]
+    stats = SimulationStats([p["name"] for p in profiles_json])
+    initargs = (profiles_json, seed, engine_options, batch)
+
+    if workers == 1:
+        init_worker(*initargs)
+        results = map(play_chunk, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=initargs)
+        results = pool.imap_unordered(play_chunk, tasks)
+    try:
+        for chunk_stats in results:
+            stats.merge(chunk_stats)
+            if on_progress is not None:
+                on_progress(stats)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play headless QNO games between AI opponent profiles.')
+    parser.add_argument('-n', '--games', type=int, default=10000, help='number of games to play')
+    parser.add_argument('-p', '--profiles', nargs='+', default=['Chester', 'Raz'],
+                        help='opponents.json profile names, one per seat (2-7)')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='base seed of the RNG streams')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='games per task')
+    parser.add_argument('--engine', choices=['scalar', 'batch'], default='scalar',
+                        help='play games one at a time (qno_engine) or each chunk in lockstep with NumPy (qno_batch, '
+                             'faster with large chunks, fixed seating)')
+    parser.add_argument('--no-replenish', action='store_true',
+                        help='end the game when the stockpile runs out instead of reshuffling the discard pile')
+    parser.add_argument('--free-drawing', action='store_true', help='allow drawing while holding playable cards')
+    parser.add_argument('--report-every', type=float, default=2.0, help='seconds between progress reports')
+    parser.add_argument('--json', help='also write the final results to this JSON file')
+    args = parser.parse_args(argv)
+    if args.engine == 'batch' and args.free_drawing:
+        parser.error('--free-drawing is not supported by --engine batch')
+
+    try:
+        profiles_json = load_profiles(args.profiles)
+    except ValueError as err:
+        parser.error(str(err))
+    engine_options = {"replenish_stack": not args.no_replenish, "free_drawing": args.free_drawing}
+
+    start = time.time()
+    last_report = start
+
+    def on_progress(stats):
+        nonlocal last_report
+        now = time.time()
+        if now - last_report >= args.report_every and stats.games < args.games:
+            last_report = now
+            print(f'[{stats.games}/{args.games} games, {stats.games / (now - start):.0f} games/s]')
+            print(stats.report(), flush=True)
+
+    stats = simulate(profiles_json, args.games, seed=args.seed, workers=args.workers,
+                     chunk_size=args.chunk_size, engine_options=engine_options, on_progress=on_progress,
+                     batch=args.engine == 'batch')
+    elapsed = time.time() - start
+    print(f'[done: {stats.games} games in {elapsed:.1f}s, {stats.games / elapsed:.0f} games/s]')
+    print(stats.report())
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(stats.to_json(), json_file, indent='\t')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import json
+import os
+import sys
+
+# Run pygame without a window or sound card.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+SETTINGS_PATH = os.path.join(ROOT, 'settings2.json')
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    """ Image and settings paths are relative to the repository root. """
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture(scope='session')
+def profiles_json():
+    """ The opponent profiles of opponents.json. """
+    with open(os.path.join(ROOT, 'opponents.json')) as profiles_file:
+        return json.load(profiles_file)
@@ -0,0 +1,143 @@
+import json
+
+import pygame
+import pytest
+
+from pygame_cards import card_holder, card_sprite, deck, enums
+from tests.conftest import SETTINGS_PATH
+
+
+@pytest.fixture(scope='module', autouse=True)
+def card_json():
+    pygame.display.init()
+    pygame.display.set_mode((10, 10))
+    pygame.font.init()  # For the count badge of compact holders
+    with open(SETTINGS_PATH) as settings:
+        card_json = json.load(settings)["card"]
+    card_sprite.set_card_json(card_json)
+    card_holder.CardsHolder.card_json = card_json
+    yield card_json
+    pygame.display.quit()
+
+
+def make_holder(num_cards, **kwargs):
+    deck_ = deck.Deck(enums.DeckType.full, (0, 0), (0, 0), None)
+    holder = card_holder.CardsHolder((100, 50), (20, 0), **kwargs)
+    holder.add_cards(deck_.pop_bottom_cards(num_cards))
+    return holder
+
+
+def test_unchanged_holder_reuses_its_snapshot():
+    holder = make_holder(10)
+    assert holder.get_dirty_rects()
+    snapshot = holder.render_snapshot()
+    assert holder.render_snapshot() is snapshot
+    assert holder.get_dirty_rects() == []
+
+
+@pytest.mark.parametrize('change', [
+    lambda holder: holder.cards[3].flip(),
+    lambda holder: holder.pop_card(3),
+    lambda holder: holder.add_card(holder.pop_bottom_card()),
+    lambda holder: holder.pop_all_cards(),
+    lambda holder: holder.sort_cards(key_func=lambda card_: card_.card_id),
+    lambda holder: (setattr(holder, 'pos', (0, 0)), holder.update_position()),
+])
+def test_changed_holder_takes_a_new_snapshot(change):
+    holder = make_holder(10)
+    holder.get_dirty_rects()
+    before = holder.render_snapshot()
+    change(holder)
+    after = holder.render_snapshot()
+    expected = tuple(card_.sprite.get_render_tuple() for card_ in holder.cards)
+    assert after is not before and after == expected
+
+
+def test_compact_holder_snapshot_follows_the_number_of_cards():
+    holder = make_holder(10, compact_threshold=5)
+    before = holder.render_snapshot()
+    assert before[0] == 10
+    holder.pop_top_card()
+    assert holder.render_snapshot()[0] == 9
+
+
+def brute_force_card_at(holder, pos):
+    for card_ in reversed(holder.cards):
+        if card_.is_clicked(pos):
+            return card_
+    return None
+
+
+def assert_card_at_matches_brute_force(holder):
+    bounds = holder.get_bounds()
+    for x in range(bounds.left - 2, bounds.right + 2, 3):
+        for y in range(bounds.top - 2, bounds.bottom + 2, 7):
+            assert holder.card_at((x, y))[0] is brute_force_card_at(holder, (x, y)), (x, y)
+
+
+@pytest.mark.parametrize('offset', [(20, 0), (-15, 0), (0, 25), (3, 2), (0, 0)])
+def test_card_at_matches_brute_force(offset):
+    deck_ = deck.Deck(enums.DeckType.full, (0, 0), (0, 0), None)
+    holder = card_holder.CardsHolder((300, 200), offset)
+    holder.add_cards(deck_.pop_bottom_cards(30))
+    holder.pop_card(7)  # Moves the cards above it.
+    assert_card_at_matches_brute_force(holder)
+
+
+def test_layout_follows_card_pos():
+    holder = make_holder(30)
+    holder.pop_card(3)
+    holder.add_card(holder.pop_bottom_card(), on_top=False)
+    holder.pos = (50, 60)
+    holder.update_position()
+    holder.layout()
+    for i, card_ in enumerate(holder.cards):
+        expected = holder.card_pos(i)
+        assert abs(card_.get_pos()[0] - expected[0]) <= 1 and abs(card_.get_pos()[1] - expected[1]) <= 1
+    assert holder.next_card_pos == holder.card_pos(len(holder.cards), len(holder.cards) + 1)
+
+
+def test_compact_holder_draws_the_top_card_and_a_badge():
+    holder = make_holder(10, compact_threshold=5)
+    assert holder.is_compact
+    draw_list = holder.get_draw_list()
+    assert len(draw_list) == 2 and draw_list[0] == holder.cards[-1].sprite.get_render_tuple()
+    while len(holder.cards) > 5:
+        holder.pop_top_card()
+    assert not holder.is_compact
+    assert len(holder.render_snapshot()) == 5
+
+
+def test_squeezed_holder_fits_in_max_width(card_json):
+    holder = make_holder(30, max_width=500)
+    assert holder.get_bounds().width <= 500
+    assert holder.card_pos(29)[0] + card_json["size"][0] <= holder.pos[0] + 500
+    assert_card_at_matches_brute_force(holder)
+    while len(holder.cards) > 3:
+        holder.pop_top_card()
+    assert holder.layout_offset() == (20, 0)
+
+
+def test_pile_of_face_up_cards_draws_only_the_top_card():
+    holder = card_holder.CardsHolder((100, 50), (0, 0))
+    deck_ = deck.Deck(enums.DeckType.full, (0, 0), (0, 0), None)
+    cards = deck_.pop_bottom_cards(20)
+    for card_ in cards:
+        card_.flip()
+    holder.add_cards(cards)
+    top_image = holder.cards[-1].sprite.get_render_tuple()[0]
+    assert not card_sprite.is_opaque(top_image)  # Rounded corners
+    assert holder.visible_cards() == [holder.cards[-1]]
+    holder.offset = (2, 0)
+    holder.update_position()
+    assert holder.visible_cards() == holder.cards
+
+
+def test_translucent_card_does_not_cover(card_json):
+    image = pygame.Surface(card_json["size"], pygame.SRCALPHA, 32)
+    image.fill((255, 255, 255, 255))
+    translucent = image.copy()
+    translucent.fill((255, 255, 255, 128))
+    assert card_sprite.covers(image, translucent, (0, 0))
+    assert not card_sprite.covers(translucent, image, (0, 0))
+    assert not card_sprite.covers(image, image, (1, 0))
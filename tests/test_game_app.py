@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pygame
+import pytest
+
+from pygame_cards import animation, controller, game_app
+from tests.conftest import SETTINGS_PATH
+
+
+class IdleController(controller.Controller):
+    """ Controller without any game, idle as soon as it is started. """
+
+    def start_game(self):
+        pass
+
+    def process_mouse_event(self, pos, down, double_click):
+        pass
+
+
+def make_app(threaded):
+    app = game_app.GameApp(json_path=SETTINGS_PATH, controller_cls=IdleController)
+    app.threaded_rendering = threaded
+    return app
+
+
+@pytest.mark.parametrize('threaded', [False, True])
+def test_first_frame_ends_idle(threaded):
+    app = make_app(threaded)
+    assert not app.is_idle()  # The first frame is still to be drawn.
+    if threaded:
+        app.publish_scene()
+    else:
+        app.update_display(app.render())
+    assert app.is_idle()
+
+
+def test_threaded_rendering_stops_publishing_when_idle():
+    app = make_app(threaded=True)
+    published = []
+    publish_scene = app.publish_scene
+
+    def counting_publish_scene():
+        published.append(1)
+        publish_scene()
+
+    app.publish_scene = counting_publish_scene
+    quit_timer = threading.Timer(0.5, lambda: pygame.event.post(pygame.event.Event(pygame.QUIT)))
+    quit_timer.start()
+    with pytest.raises(SystemExit):
+        app.execute()
+    # At 60 frames per second it would have published some 30 scenes by now.
+    assert len(published) <= 3
+
+
+def test_cancelling_the_game_calls_keeps_label_timeouts():
+    app = make_app(threaded=False)
+    moves = []
+    app.game_controller.scheduler.schedule(0, lambda: moves.append(1))
+    label = app.gui_interface.show_label((0, 0), "text", timeout=0.001, id_='label')
+    app.game_controller.scheduler.cancel_all()  # As restart_game() does
+    time.sleep(0.01)
+    assert app.time_until_next_call_ms() == 0
+    app.execute_game_logic()
+    assert moves == [] and label.expired
+    app.render()
+    assert not app.gui_interface.has_id('label')
+
+
+def test_turbo_mode_waits_between_frames():
+    app = make_app(threaded=False)
+    game_controller = app.game_controller
+    game_controller.turbo = True
+    # Endless, like the background pulse after a game is over.
+    pulse = animation.ColorPulseAnimation((0, 0, 0), (255, 255, 255), 1000,
+                                          lambda color: setattr(game_controller, 'background_color', color))
+    game_controller.animations.append(pulse)
+    iterations = []
+    execute_game_logic = app.execute_game_logic
+
+    def counting_execute_game_logic():
+        iterations.append(1)
+        execute_game_logic()
+
+    app.execute_game_logic = counting_execute_game_logic
+    quit_timer = threading.Timer(0.5, lambda: pygame.event.post(pygame.event.Event(pygame.QUIT)))
+    quit_timer.start()
+    with pytest.raises(SystemExit):
+        app.execute()
+    # A few per frame drawn at turbo_fps, instead of as many as the CPU allows.
+    assert len(iterations) <= 10 * app.turbo_fps
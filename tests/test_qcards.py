@@ -0,0 +1,39 @@
+import random
+
+import QNO
+import qcards
+import qno_engine
+
+
+def naive_can_play(kind, current_state, top_value):
+    """ The legality check before cards were encoded as bitmasks. """
+    state, value = kind
+    return state == qcards.GATE or state == current_state or value == top_value
+
+
+def test_deck():
+    assert qcards.NUM_CARDS == 112
+    assert [list(kind) for kind in qcards.DECK] == QNO.buildDeck()
+    assert [(c.suit, c.rank) for c in qno_engine.DECK] == list(qcards.DECK)
+    assert [c.card_id for c in qno_engine.DECK] == list(range(qcards.NUM_CARDS))
+
+
+def test_playable_mask_matches_naive_check():
+    for current_state in qcards.STATES:
+        for top_value in qcards.VALUES + qcards.GATE_VALUES:
+            mask = qcards.playable_mask(current_state, top_value)
+            for card_id, kind in enumerate(qcards.DECK):
+                assert bool(mask >> card_id & 1) == naive_can_play(kind, current_state, top_value)
+
+
+def test_hand_masks():
+    rng = random.Random(0)
+    for _ in range(100):
+        hand = rng.sample(qno_engine.DECK, rng.randint(0, 20))
+        mask = qcards.hand_mask(hand)
+        assert qcards.ids_of(mask) == sorted(c.card_id for c in hand)
+        current_state = rng.choice(qcards.STATES)
+        top_value = rng.choice(qcards.VALUES)
+        kinds = [(c.suit, c.rank) for c in hand]
+        assert QNO.canPlay(current_state, top_value, kinds) == any(
+            naive_can_play(kind, current_state, top_value) for kind in kinds)
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+import qcircuit
+import qstate
+
+
+def test_classical_gates_are_compacted():
+    circuit = qcircuit.GameCircuit(history_length=16, compact_after=4)
+    state = qstate.TwoQubitState()
+    rng = random.Random(0)
+    for _ in range(100):
+        qubit = rng.randint(0, 1)
+        if rng.random() < 0.5:
+            circuit.x(qubit)
+            state.x(qubit)
+        else:
+            circuit.cx(qubit, 1 - qubit)
+            state.cx(qubit, 1 - qubit)
+        assert len(circuit) < 4
+        assert circuit.basis_key == state.basis_state()
+    assert len(circuit.history) == 16
+
+
+def test_superposition_is_not_compacted():
+    circuit = qcircuit.GameCircuit(compact_after=2)
+    circuit.x(0)
+    circuit.h(1)
+    for _ in range(5):
+        circuit.x(0)
+    assert circuit.basis_key is None
+    assert len(circuit) == 7
+    circuit.initialize('10')
+    assert circuit.basis_key == '10' and len(circuit) == 0
+
+
+def test_live_circuit_matches_the_gates_played():
+    quantum_info = pytest.importorskip('qiskit.quantum_info')
+    circuit = qcircuit.GameCircuit(compact_after=3)
+    state = qstate.TwoQubitState()
+    for qubit in (0, 1, 1, 0, 0):
+        circuit.x(qubit)
+        state.x(qubit)
+    circuit.h(0)
+    state.h(0)
+    assert state.matches(quantum_info.Statevector(circuit.circuit).probabilities_dict())
+
+
+def test_history_circuit_starts_from_the_oldest_kept_gate():
+    quantum_info = pytest.importorskip('qiskit.quantum_info')
+    circuit = qcircuit.GameCircuit(history_length=3, compact_after=100)
+    for qubit in (0, 1, 0, 1, 1):
+        circuit.x(qubit)
+    history = circuit.history_circuit()
+    assert history.count_ops()['x'] == 3
+    assert quantum_info.Statevector(history).probabilities_dict() == {circuit.basis_key: pytest.approx(1)}
+
+
+def test_history_does_not_start_in_a_superposition():
+    quantum_info = pytest.importorskip('qiskit.quantum_info')
+    circuit = qcircuit.GameCircuit(history_length=2, compact_after=100)
+    circuit.x(1)
+    circuit.h(0)
+    circuit.x(1)  # Played in the superposition
+    circuit.x(0)
+    assert circuit.history[0].basis_before is not None
+    expected = qstate.TwoQubitState()
+    for name, args, _ in circuit.ops:
+        getattr(expected, name)(*args)
+    assert expected.matches(quantum_info.Statevector(circuit.history_circuit()).probabilities_dict())
+
+    circuit.measure_all()
+    circuit.initialize('01')
+    circuit.x(1)
+    assert [record.name for record in circuit.history] == ['initialize', 'x']
+    assert quantum_info.Statevector(circuit.history_circuit()).probabilities_dict() == {'11': pytest.approx(1)}
@@ -0,0 +1,6 @@
+import qno_batch
+
+
+def test_batch_engine_plays_the_same_games(profiles_json):
+    assert qno_batch.validate(profiles_json[:4], list(range(50))) == []
+    assert qno_batch.validate(profiles_json[:2], list(range(20)), replenish_stack=False) == []
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import opponent
+import qcards
+import qno_engine
+
+
+@pytest.mark.parametrize('num_players', [2, 4, 7])
+@pytest.mark.parametrize('replenish_stack', [True, False])
+def test_games_keep_every_card_once(profiles_json, num_players, replenish_stack):
+    for seed in range(10):
+        rng = random.Random(seed)
+        profiles = [opponent.Opponent(p, rng=rng) for p in profiles_json[:num_players]]
+        s = qno_engine.run_game(profiles, rng=rng, replenish_stack=replenish_stack)
+        assert s.phase == qno_engine.OVER
+        cards = s.stockpile + s.discard + [c for hand in s.hands for c in hand]
+        assert sorted(c.card_id for c in cards) == list(range(qcards.NUM_CARDS))
+        assert s.hand_masks == [qcards.hand_mask(hand) for hand in s.hands]
+        fewest = min(len(hand) for hand in s.hands)
+        assert s.winners == [p for p, hand in enumerate(s.hands) if len(hand) == fewest]
+
+
+def test_legal_actions_follow_the_rules(profiles_json):
+    rng = random.Random(1)
+    profiles = [opponent.Opponent(p, rng=rng) for p in profiles_json[:3]]
+    engine = qno_engine.Engine(len(profiles), rng=rng)
+    s = engine.new_game()
+    assert s.top_card.getState() != qcards.GATE
+    while s.phase != qno_engine.OVER:
+        actions = engine.legal_actions()
+        if s.phase == qno_engine.PLAY:
+            playable = [a for a in actions if isinstance(a, qno_engine.PlayCard)]
+            assert [s.current_hand[a.index] for a in playable] == [
+                c for c in s.current_hand if engine.can_play_card(c)]
+            assert (qno_engine.DrawCard() in actions) == (not playable)
+            if playable:
+                with pytest.raises(ValueError):
+                    engine.apply(qno_engine.DrawCard())
+        action = engine.ai_action(profiles[s.turn])
+        assert action in actions
+        engine.apply(action)
+
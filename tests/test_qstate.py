@@ -0,0 +1,96 @@
+import json
+import random
+
+import pytest
+
+import opponent
+import qcircuit
+import qno_engine
+import qstate
+from tests.conftest import ROOT
+
+GATE_METHODS = ('x', 'h', 'cx')
+
+
+def apply_random_gate(rng, *targets):
+    name = rng.choice(GATE_METHODS)
+    qubit = rng.randint(0, 1)
+    args = (qubit, 1 - qubit) if name == 'cx' else (qubit,)
+    for target in targets:
+        getattr(target, name)(*args)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_native_state_matches_qiskit(seed):
+    quantum_info = pytest.importorskip('qiskit.quantum_info')
+    rng = random.Random(seed)
+    basis = rng.choice(qstate.BASIS_KEYS)
+    state = qstate.TwoQubitState(basis)
+    circuit = qcircuit.GameCircuit()
+    circuit.reset(basis)
+    for _ in range(30):
+        apply_random_gate(rng, state, circuit)
+        assert state.matches(quantum_info.Statevector(circuit.circuit).probabilities_dict())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_native_state_matches_qiskit_over_games(seed):
+    quantum_info = pytest.importorskip('qiskit.quantum_info')
+    with open(f'{ROOT}/opponents.json') as profiles_json:
+        profiles = [opponent.Opponent(p, rng=random.Random(seed)) for p in json.load(profiles_json)[:3]]
+    engine = qno_engine.Engine(len(profiles), rng=random.Random(seed))
+    s = engine.new_game()
+    circuit = qcircuit.GameCircuit()
+    while s.phase != qno_engine.OVER:
+        action = engine.ai_action(profiles[s.turn])
+        gate = s.top_card.getValue()
+        if isinstance(action, qno_engine.ChooseQubit):
+            # Played cards set the state; the GUI adds X gates to the circuit for them.
+            for qubit in qstate.BASIS_FLIPS[(qstate.KET_OF[circuit.basis_key], s.current_state)]:
+                circuit.x(qubit)
+        engine.apply(action)
+        if isinstance(action, qno_engine.ChooseQubit):
+            qno_engine.apply_gate(circuit, gate, qno_engine.CHOICE_QUBITS[action.choice])
+            assert s.qstate.matches(quantum_info.Statevector(circuit.circuit).probabilities_dict())
+        elif isinstance(action, qno_engine.Guess):
+            circuit.initialize(s.current_state[1:3])
+            assert s.qstate.basis_state() == circuit.basis_key
+
+
+def baseline_possible_states(gate, state):
+    """ Crazy8sController.getPossibleStates() before the states were tabulated. """
+    possible_states = []
+    if gate == "X":
+        for idx in [0, 1]:
+            new_t = list(state)
+            new_t[idx] = (new_t[idx] + 1) % 2
+            possible_states.append(new_t)
+    elif gate == "CNOT":
+        for control_idx in [0, 1]:
+            new_t = list(state)
+            if new_t[control_idx] == 1:
+                target_idx = (control_idx + 1) % 2
+                new_t[target_idx] = (new_t[target_idx] + 1) % 2
+            possible_states.append(new_t)
+    elif gate == "H":
+        for idx in [0, 1]:
+            new_t = list(state)
+            for val in [0, 1]:
+                new_t[idx] = val
+                possible_states.append(list(new_t))
+    return tuple(f'|{t[0]}{t[1]}>' for t in possible_states)
+
+
+@pytest.mark.parametrize('gate', qstate.GATES)
+def test_possible_states_match_baseline(gate):
+    for q1 in range(2):
+        for q0 in range(2):
+            ket = f'|{q1}{q0}>'
+            assert qstate.POSSIBLE_STATES[(ket, gate)] == baseline_possible_states(gate, (q1, q0))
+
+
+def test_gate_outcomes_follow_the_state_vector():
+    for (ket, gate, qubit), branches in qstate.GATE_OUTCOMES.items():
+        state = qstate.TwoQubitState(ket[1:3])
+        qno_engine.apply_gate(state, gate, qubit)
+        assert state.probabilities_dict() == pytest.approx({k[1:3]: p for k, p in branches})
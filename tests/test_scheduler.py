@@ -0,0 +1,51 @@
+import pygame
+import pytest
+
+from pygame_cards import gui, scheduler
+
+
+def test_calls_run_in_due_order():
+    sched = scheduler.Scheduler()
+    ran = []
+    sched.schedule(0, lambda: ran.append('b'))
+    sched.schedule(-10, lambda: ran.append('a'))
+    sched.schedule(0, lambda: ran.append('c'))  # Same delay as 'b', runs after it
+    sched.schedule(60000, lambda: ran.append('late'))
+    assert sched.run_due() == 3
+    assert ran == ['a', 'b', 'c']
+    assert 0 < sched.time_until_next_ms() <= 60000
+
+
+def test_cancelled_calls_do_not_run():
+    sched = scheduler.Scheduler()
+    ran = []
+    first = sched.schedule(0, lambda: ran.append('first'))
+    # A callback may cancel another call that is due in the same run_due().
+    sched.schedule(-10, first.cancel)
+    assert sched.run_due() == 1
+    assert ran == [] and not first.pending
+    assert sched.time_until_next_ms() is None
+
+
+def test_cancel_all():
+    sched = scheduler.Scheduler()
+    calls = [sched.schedule(delay, lambda: None) for delay in (0, 10, 60000)]
+    sched.cancel_all()
+    assert sched.run_due() == 0
+    assert not any(call.pending for call in calls)
+    assert sched.time_until_next_ms() is None
+
+
+def test_label_timeout_needs_a_scheduler():
+    pygame.font.init()
+    screen = pygame.Surface((10, 10))
+    with pytest.raises(ValueError):
+        gui.Label(screen, (0, 0), "text")
+    assert gui.Label(screen, (0, 0), "text", timeout=0).timer is None
+
+    sched = scheduler.Scheduler()
+    label = gui.Label(screen, (0, 0), "text", timeout=-1, scheduler=sched)
+    expired = []
+    label.on_expire = expired.append
+    sched.run_due()
+    assert label.expired and expired == [label]